@@ -0,0 +1,206 @@
+"""Asynchronous Proxmox Client."""
+
+import asyncio
+from time import monotonic, perf_counter
+from typing import Any
+from urllib.parse import quote, urlsplit
+
+from prometheuspvesd.client import (
+    _MISSING,
+    PVE_REQUEST_COUNT_ERROR_TOTAL,
+    PVE_REQUEST_COUNT_TOTAL,
+    ProxmoxClientBase,
+)
+from prometheuspvesd.exception import APIError, APITimeoutError
+from prometheuspvesd.logger import SingleLog
+from prometheuspvesd.utils import to_bool
+
+try:
+    import aiohttp
+    from proxmoxer import ResourceException
+
+    HAS_AIOHTTP = True
+except ImportError:
+    HAS_AIOHTTP = False
+
+DEFAULT_PORT = 8006
+
+# Age in seconds after which a ticket is renewed, PVE tickets are valid for two hours
+TICKET_RENEW_AGE = 3600
+
+
+class AsyncProxmoxClient(ProxmoxClientBase):
+    """
+    Asynchronous Proxmox API Client.
+
+    Provides the same request methods as `ProxmoxClient` as coroutines. Requests can only
+    be made after `connect()`, which opens the session and authenticates against the API.
+    """
+
+    def __init__(self) -> None:
+        if not HAS_AIOHTTP:
+            log = SingleLog()
+            log.sysexit_with_message(
+                "The asyncio backend of Proxmox VE Prometheus SD requires aiohttp: "
+                "https://pypi.org/project/aiohttp/"
+            )
+
+        super().__init__()
+        server = urlsplit(f"//{self.config.config['pve']['server']}")
+        self.base_url = f"https://{server.hostname}:{server.port or DEFAULT_PORT}/api2/json"
+        self.client: aiohttp.ClientSession | None = None
+        self.headers: dict[str, str] = {}
+        self.authenticated: float | None = None
+
+    async def connect(self) -> None:
+        """
+        Open the HTTP session and authenticate if not done yet.
+
+        The session and its connection pool are kept for the lifetime of the client. Tickets
+        are renewed once they are older than an hour, like proxmoxer does for the sync client.
+        """
+        if self.client is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.config.config["pve"]["pool_size"],
+                ssl=to_bool(self.config.config["pve"]["verify_ssl"]),
+                force_close=not to_bool(self.config.config["pve"]["keep_alive"]),
+            )
+            timeout = aiohttp.ClientTimeout(total=self.config.config["pve"]["request_timeout"])
+            self.client = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+        if self.authenticated is None or monotonic() - self.authenticated >= TICKET_RENEW_AGE:
+            await self._auth()
+            self.authenticated = monotonic()
+            self.logger.debug("Successfully authenticated")
+
+    async def close(self) -> None:
+        """Close the HTTP session and all pooled connections."""
+        if self.client is not None:
+            await self.client.close()
+
+        self.client = None
+        self.authenticated = None
+
+    async def _auth(self) -> None:
+        if self.client is None:
+            raise APIError("Authentication requires an active session")
+
+        self.logger.debug(
+            "Trying to authenticate against {} as user {}".format(
+                self.config.config["pve"]["server"],
+                self.config.config["pve"]["user"],
+            )
+        )
+
+        if self.config.config["pve"]["token_name"]:
+            self.logger.debug("Using token login")
+            self.headers = {
+                "Authorization": "PVEAPIToken={}!{}={}".format(
+                    self.config.config["pve"]["user"],
+                    self.config.config["pve"]["token_name"],
+                    self.config.config["pve"]["token_value"],
+                )
+            }
+            return
+
+        try:
+            async with self.client.post(
+                f"{self.base_url}/access/ticket",
+                data={
+                    "username": self.config.config["pve"]["user"],
+                    "password": self.config.config["pve"]["password"],
+                },
+                timeout=aiohttp.ClientTimeout(total=self.config.config["pve"]["auth_timeout"]),
+            ) as resp:
+                resp.raise_for_status()
+                ticket = (await resp.json())["data"]["ticket"]
+        except (aiohttp.ClientError, TimeoutError) as e:
+            PVE_REQUEST_COUNT_ERROR_TOTAL.inc()
+            raise APIError(str(e)) from e
+
+        self.headers = {"Cookie": f"PVEAuthCookie={ticket}"}
+
+    async def _get(self, *args: str, **params: str) -> Any:
+        if self.client is None:
+            raise APIError("Requests require an active session")
+
+        url = "/".join([self.base_url, *(quote(str(arg)) for arg in args)])
+        async with self.client.get(url, params=params, headers=self.headers) as resp:
+            if resp.status >= 400:
+                raise ResourceException(resp.status, resp.reason or "", await resp.text())
+
+            return (await resp.json())["data"]
+
+    async def _do_request(self, *args: str, retry: bool = True, **params: str) -> Any:
+        key = self._get_cache_key(args, params)
+        cached = self._get_cached(key)
+        if cached is not _MISSING:
+            return cached
+
+        attempt = 0
+        while True:
+            PVE_REQUEST_COUNT_TOTAL.inc()
+            start = perf_counter()
+            try:
+                response = await self._get(*args, **params)
+            except (aiohttp.ClientError, TimeoutError, ResourceException) as e:
+                self._observe_request(args, perf_counter() - start, e)
+                PVE_REQUEST_COUNT_ERROR_TOTAL.inc()
+                delay = self._get_retry_delay(e, attempt) if retry else None
+                if delay is not None:
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+                if isinstance(e, ResourceException):
+                    raise
+                if isinstance(e, TimeoutError):
+                    raise APITimeoutError(str(e) or type(e).__name__) from e
+                raise APIError(str(e) or type(e).__name__) from e
+
+            self._observe_request(args, perf_counter() - start)
+            break
+
+        self._set_cached(key, response)
+        return response
+
+    async def get_cluster_resources(self) -> Any:
+        self.logger.debug("fetching all nodes and guests from cluster resources")
+        return await self._do_request("cluster", "resources")
+
+    async def get_cluster_tasks(self) -> Any:
+        self.logger.debug("fetching recent cluster tasks")
+        return await self._do_request("cluster", "tasks")
+
+    async def get_nodes(self) -> Any:
+        self.logger.debug("fetching all nodes")
+        return await self._do_request("nodes")
+
+    async def get_pool(self, poolid: str) -> Any:
+        self.logger.debug(f"fetching members of pool {poolid}")
+        return await self._do_request("pools", poolid)
+
+    async def get_all_vms(self, pve_node: str) -> Any:
+        self.logger.debug(f"fetching all vms on node {pve_node}")
+        return await self._do_request("nodes", pve_node, "qemu")
+
+    async def get_all_containers(self, pve_node: str) -> Any:
+        self.logger.debug(f"fetching all containers on node {pve_node}")
+        return await self._do_request("nodes", pve_node, "lxc")
+
+    async def get_instance_config(self, pve_node: str, pve_type: str, vmid: str) -> Any:
+        self.logger.debug(f"fetching instance config for {vmid} on {pve_node}")
+        return await self._do_request("nodes", pve_node, pve_type, vmid, "config")
+
+    async def get_agent_info(self, pve_node: str, pve_type: str, vmid: str) -> Any:
+        self.logger.debug(f"fetching agent info for {vmid} on {pve_node}")
+        response = await self._do_request(
+            "nodes", pve_node, pve_type, vmid, "agent", "info", retry=False
+        )
+        return response["result"]
+
+    async def get_network_interfaces(self, pve_node: str, vmid: str) -> Any:
+        self.logger.debug(f"fetching network interfaces for {vmid} on {pve_node}")
+        response = await self._do_request(
+            "nodes", pve_node, "qemu", vmid, "agent", "network-get-interfaces", retry=False
+        )
+        return response["result"]
@@ -2,12 +2,8 @@
 """Entrypoint and CLI handler."""
 
 import argparse
-import json
-import shutil
 import signal
-import tempfile
-from os import chmod
-from time import sleep
+from time import monotonic, sleep
 from typing import Any, Optional
 
 from prometheus_client import start_http_server
@@ -15,10 +11,14 @@ from prometheus_client import start_http_server
 import prometheuspvesd.exception
 from prometheuspvesd import __version__
 from prometheuspvesd.config import SingleConfig
-from prometheuspvesd.discovery import Discovery
+from prometheuspvesd.discovery import PHASE_TIME, Discovery
 from prometheuspvesd.exception import APIError
+from prometheuspvesd.filters import GuestFilter
 from prometheuspvesd.logger import SingleLog
 from prometheuspvesd.model import HostList
+from prometheuspvesd.output import FileWriter, OutputWriter, get_path_fields
+from prometheuspvesd.scheduler import Scheduler
+from prometheuspvesd.server import HTTPSDServer
 
 
 class PrometheusSD:
@@ -29,6 +29,7 @@ class PrometheusSD:
         self.logger = self.log.logger
         self.args: dict[str, str] = self._cli_args()
         self.config = self._get_config()
+        self.writers = self._get_writers()
 
         signal.signal(signal.SIGINT, self._terminate)
         signal.signal(signal.SIGTERM, self._terminate)
@@ -130,12 +131,64 @@ class PrometheusSD:
                 "are required but not set"
             )
 
+        choices: list[tuple[str, str, list[str]]] = [
+            ("discovery.backend", config.config["discovery"]["backend"], ["sync", "async"]),
+            ("discovery.inventory", config.config["discovery"]["inventory"], ["cluster", "nodes"]),
+        ]
+        for name, value, allowed in choices:
+            if value not in allowed:
+                self.log.sysexit_with_message(
+                    f"Option '{name}' must be one of: {', '.join(allowed)}"
+                )
+
+        if config.config["service"] and config.config["loop_delay"] < 1:
+            self.log.sysexit_with_message("Option 'loop_delay' must be at least 1")
+
+        if config.config["events"]["enabled"] and config.config["events"]["poll_interval"] < 1:
+            self.log.sysexit_with_message("Option 'events.poll_interval' must be at least 1")
+
+        shard = config.config["shard"]
+        if shard["count"] < 1 or not 0 <= shard["index"] < shard["count"]:
+            self.log.sysexit_with_message(
+                "Option 'shard.count' must be at least 1 and 'shard.index' between 0 and "
+                "'shard.count' - 1"
+            )
+
+        try:
+            GuestFilter(config.config)
+            for output in config.config["outputs"] or [{"file": config.config["output_file"]}]:
+                get_path_fields(output["file"])
+        except prometheuspvesd.exception.ConfigError as e:
+            self.log.sysexit_with_message(str(e))
+
         self.logger.info(f"Using config file {config.config_file}")
 
         return config
 
+    def _get_writers(self) -> list[OutputWriter]:
+        outputs = self.config.config["outputs"]
+        if not outputs:
+            return [
+                FileWriter(
+                    self.config.config["output_file"],
+                    self.config.config["output_file_mode"],
+                    self.config.config["output_file_indent"],
+                )
+            ]
+
+        return [
+            FileWriter(
+                output["file"],
+                output.get("mode", self.config.config["output_file_mode"]),
+                output.get("indent", self.config.config["output_file_indent"]),
+            )
+            for output in outputs
+        ]
+
     def _fetch(self) -> None:
-        self.logger.info("Writes targets to {}".format(self.config.config["output_file"]))
+        for writer in self.writers:
+            if isinstance(writer, FileWriter):
+                self.logger.info(f"Writes targets to {writer.path}")
         self.logger.debug("Propagate from PVE")
 
         if self.config.config["service"] and self.config.config["metrics"]["enabled"]:
@@ -149,37 +202,82 @@ class PrometheusSD:
                 addr=self.config.config["metrics"]["address"],
             )
 
+        if self.config.config["service"] and self.config.config["http_sd"]["enabled"]:
+            self.logger.info(
+                "Starting http sd endpoint on port {}".format(
+                    self.config.config["http_sd"]["port"]
+                )
+            )
+            http_sd = HTTPSDServer(
+                self.config.config["http_sd"]["address"],
+                self.config.config["http_sd"]["port"],
+                self.config.config["http_sd"]["path"],
+            )
+            http_sd.start()
+            self.writers.append(http_sd)
+
+        scheduler = Scheduler(
+            self.config.config["loop_delay"],
+            self.config.config["loop_jitter"],
+            self.config.config["loop_max_delay"],
+        )
+        if self.config.config["service"]:
+            # Spread the first loop of instances that were started at the same time
+            sleep(scheduler.get_jitter())
+
         while True:
-            try:
-                inventory = self.discovery.propagate()
-            except APIError as e:
-                self.logger.error(f"Proxmoxer API error: {str(e).strip()}")
-            except Exception as e:  # noqa
-                self.logger.error(f"Unknown error: {str(e).strip()}")
-            else:
-                self._write(inventory)
+            scheduler.start()
+            self._propagate()
 
             if not self.config.config["service"]:
+                self.discovery.close()
                 break
 
-            self.logger.info(
-                "Waiting {} seconds for next discovery loop".format(
-                    self.config.config["loop_delay"]
-                )
-            )
-            sleep(self.config.config["loop_delay"])
+            delay = scheduler.finish()
+            self.logger.info(f"Waiting {delay:.0f} seconds for next discovery loop")
+            if self.config.config["events"]["enabled"]:
+                self._watch_events(delay)
+            else:
+                sleep(delay)
 
-    def _write(self, host_list: HostList) -> None:
-        output: list[dict[str, str]] = []
-        for host in host_list.hosts:
-            output.append(host.to_sd_json())
+    def _propagate(self, refresh: set[str] | None = None) -> None:
+        try:
+            inventory = self.discovery.propagate(refresh)
+        except APIError as e:
+            self.logger.error(f"Proxmoxer API error: {str(e).strip()}")
+        except Exception as e:  # noqa
+            self.logger.error(f"Unknown error: {str(e).strip()}")
+        else:
+            self._write(inventory)
+
+    def _watch_events(self, delay: float) -> None:
+        """
+        Poll the cluster task log until the next full discovery loop is due.
+
+        Guests affected by finished tasks are refreshed right away, the full loop after
+        `delay` seconds remains as safety net for changes without a task.
+        """
+        deadline = monotonic() + delay
+        while (remaining := deadline - monotonic()) > 0:
+            sleep(min(self.config.config["events"]["poll_interval"], remaining))
 
-        # Write to tmp file and move after write
-        with tempfile.NamedTemporaryFile(mode="w", prefix="prometheus-pve-sd", delete=False) as tf:
-            json.dump(output, tf, indent=4)
+            try:
+                vmids = self.discovery.poll_events()
+            except Exception as e:  # noqa: BLE001
+                self.logger.warning(f"Unable to poll cluster tasks: {str(e).strip()}")
+                continue
+
+            if vmids:
+                self.logger.info(f"Refreshing targets after cluster tasks for {sorted(vmids)}")
+                self._propagate(vmids)
 
-        shutil.move(tf.name, self.config.config["output_file"])
-        chmod(self.config.config["output_file"], int(self.config.config["output_file_mode"], 8))
+    @PHASE_TIME.labels("write").time()
+    def _write(self, host_list: HostList) -> None:
+        for writer in self.writers:
+            try:
+                writer.write(host_list)
+            except OSError as e:
+                self.logger.error(f"Unable to write targets: {str(e).strip()}")
 
     def _terminate(self, signal: int, frame: Optional[Any] = None) -> None:  # noqa
         self.log.sysexit_with_message("Terminating", code=0)
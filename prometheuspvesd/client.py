@@ -1,18 +1,24 @@
 """Proxmox Client."""
 
+import random
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from time import perf_counter, sleep
 from typing import Any
 
 import requests
-from prometheus_client import Counter
+from prometheus_client import Counter, Gauge, Histogram
+from requests.adapters import HTTPAdapter
 
 from prometheuspvesd.config import SingleConfig
-from prometheuspvesd.exception import APIError
+from prometheuspvesd.exception import APIError, APITimeoutError
 from prometheuspvesd.logger import SingleLog
 from prometheuspvesd.model import HostList
 from prometheuspvesd.utils import to_bool
 
 try:
-    from proxmoxer import ProxmoxAPI
+    from proxmoxer import ProxmoxAPI, ResourceException
 
     HAS_PROXMOXER = True
 except ImportError:
@@ -22,9 +28,198 @@ PVE_REQUEST_COUNT_TOTAL = Counter("pve_sd_requests_total", "Total count of reque
 PVE_REQUEST_COUNT_ERROR_TOTAL = Counter(
     "pve_sd_requests_error_total", "Total count of failed requests to PVE API"
 )
+PVE_REQUEST_CACHE_HIT_TOTAL = Counter(
+    "pve_sd_requests_cache_hit_total", "Total count of requests to PVE API served from cache"
+)
+PVE_REQUEST_CACHE_MISS_TOTAL = Counter(
+    "pve_sd_requests_cache_miss_total", "Total count of requests to PVE API missing the cache"
+)
+PVE_REQUEST_RETRY_TOTAL = Counter(
+    "pve_sd_requests_retry_total", "Total count of retried requests to PVE API"
+)
+PVE_REQUEST_GIVEUP_TOTAL = Counter(
+    "pve_sd_requests_giveup_total", "Total count of requests to PVE API failed after retries"
+)
+PVE_CONNECTIONS = Gauge("pve_sd_connections", "Number of pooled connections to PVE API", ["state"])
+PVE_REQUEST_TIME = Histogram(
+    "pve_sd_api_request_seconds",
+    "Latency of requests to PVE API by endpoint and status class, the node is only set if enabled",
+    ["endpoint", "node", "status"],
+)
+PVE_REQUEST_ERROR_TOTAL = Counter(
+    "pve_sd_api_request_errors_total",
+    "Failed requests to PVE API by endpoint and status class, the node is only set if enabled",
+    ["endpoint", "node", "status"],
+)
+
+# Upper bound of the delay between two attempts of a request in seconds
+RETRY_BACKOFF_MAX = 30.0
+
+# Marker for responses not found in the request cache
+_MISSING = object()
+
+# Endpoint kinds by normalized request path
+ENDPOINTS = {
+    "cluster/resources": "cluster_resources",
+    "cluster/tasks": "cluster_tasks",
+    "nodes": "nodes",
+    "nodes/{node}/qemu": "qemu",
+    "nodes/{node}/lxc": "lxc",
+    "nodes/{node}/qemu/{vmid}/config": "config",
+    "nodes/{node}/lxc/{vmid}/config": "config",
+    "nodes/{node}/qemu/{vmid}/agent/info": "agent_info",
+    "nodes/{node}/qemu/{vmid}/agent/network-get-interfaces": "interfaces",
+    "pools/{poolid}": "pool",
+}
+
+
+def normalize_path(args: tuple[str, ...]) -> tuple[str, str]:
+    """
+    Replace the parameters of a request path with placeholders.
+
+    Node names, pool IDs and numeric IDs like the vmid are replaced, so the number of
+    distinct paths is bounded by the API schema instead of the size of the cluster.
+
+    :param args: Request path segments, e.g. `("nodes", "pve1", "qemu", "100", "config")`
+    :returns: Tuple of normalized path like `nodes/{node}/qemu/{vmid}/config` and node name
+        (empty if the path is not below a node)
+    """
+    path = [str(arg) for arg in args]
+    node = ""
+    if path[0] == "nodes" and len(path) > 1:
+        node = path[1]
+        path[1] = "{node}"
+    elif path[0] == "pools" and len(path) > 1:
+        path[1] = "{poolid}"
+
+    return "/".join("{vmid}" if segment.isdigit() else segment for segment in path), node
+
+
+def get_endpoint(args: tuple[str, ...]) -> tuple[str, str]:
+    """
+    Return the endpoint kind and node of a request path.
+
+    :param args: Request path segments, e.g. `("nodes", "pve1", "qemu")`
+    :returns: Tuple of endpoint kind like `qemu` or `config` and node name (empty if none).
+        Paths without a known kind are returned normalized.
+    """
+    path, node = normalize_path(args)
+    return ENDPOINTS.get(path, path), node
+
+
+def get_status_class(error: Exception | None) -> str:
+    """Return the HTTP status class of a request, `timeout` or `error` if there is no response."""
+    if error is None:
+        return "2xx"
+    if isinstance(error, ResourceException):
+        return f"{error.status_code // 100}xx"
+    if isinstance(error, (TimeoutError, requests.Timeout)):
+        return "timeout"
+
+    return "error"
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTP adapter that applies a fixed timeout to all requests."""
+
+    def __init__(self, timeout: float, *args: Any, **kwargs: Any) -> None:
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request: requests.PreparedRequest, **kwargs: Any) -> requests.Response:  # type: ignore[override]
+        kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+class ProxmoxClientBase:
+    """Request caching and retry handling shared by the Proxmox API clients."""
+
+    def __init__(self) -> None:
+        self.config = SingleConfig()
+        self.log = SingleLog()
+        self.logger = self.log.logger
+        self._cache: dict[tuple[str, ...], Any] | None = None
+        self._cache_lock = threading.Lock()
+        self.retry_budget = self.config.config["pve"]["retry_budget"]
+        self._retry_lock = threading.Lock()
+        self.node_labels = self.config.config["metrics"]["node_labels"]
+
+    @contextmanager
+    def request_cache(self) -> Iterator[None]:
+        """
+        Memoize responses by request path for the duration of the context.
+
+        Used to ensure that every resource is fetched at most once per discovery pass.
+        """
+        with self._cache_lock:
+            self._cache = {}
+        try:
+            yield
+        finally:
+            with self._cache_lock:
+                self._cache = None
+
+    def _get_cache_key(self, args: tuple[str, ...], params: dict[str, str]) -> tuple[str, ...]:
+        return (*map(str, args), *(f"{k}={v}" for k, v in sorted(params.items())))
+
+    def _get_cached(self, key: tuple[str, ...]) -> Any:
+        with self._cache_lock:
+            if self._cache is None:
+                return _MISSING
+
+            if key in self._cache:
+                PVE_REQUEST_CACHE_HIT_TOTAL.inc()
+                return self._cache[key]
 
+            PVE_REQUEST_CACHE_MISS_TOTAL.inc()
+            return _MISSING
 
-class ProxmoxClient:
+    def _set_cached(self, key: tuple[str, ...], response: Any) -> None:
+        with self._cache_lock:
+            if self._cache is not None:
+                self._cache[key] = response
+
+    def _observe_request(
+        self, args: tuple[str, ...], seconds: float, error: Exception | None = None
+    ) -> None:
+        endpoint, node = get_endpoint(args)
+        labels = (endpoint, node if self.node_labels else "", get_status_class(error))
+        PVE_REQUEST_TIME.labels(*labels).observe(seconds)
+        if error is not None:
+            PVE_REQUEST_ERROR_TOTAL.labels(*labels).inc()
+
+    def reset_retry_budget(self) -> None:
+        with self._retry_lock:
+            self.retry_budget = self.config.config["pve"]["retry_budget"]
+
+    def _get_retry_delay(self, error: Exception, attempt: int) -> float | None:
+        """
+        Decide whether a failed request should be retried and return the backoff delay.
+
+        Connection errors, timeouts and server errors are retried up to `pve.retries` times,
+        as long as the retry budget of the current discovery pass is not exhausted. Requests
+        made with `retry=False` skip this check, e.g. guest agent requests that fail with a
+        server error if the agent is not running.
+        """
+        if isinstance(error, ResourceException) and error.status_code < 500:
+            return None
+
+        with self._retry_lock:
+            if attempt >= self.config.config["pve"]["retries"] or self.retry_budget <= 0:
+                PVE_REQUEST_GIVEUP_TOTAL.inc()
+                return None
+            self.retry_budget -= 1
+
+        # Exponential backoff with full jitter
+        backoff = min(self.config.config["pve"]["retry_backoff"] * 2**attempt, RETRY_BACKOFF_MAX)
+        delay = random.uniform(0, backoff)  # noqa: S311
+        self.logger.debug(f"Request failed, retrying in {delay:.2f} seconds: {str(error).strip()}")
+        PVE_REQUEST_RETRY_TOTAL.inc()
+
+        return delay
+
+
+class ProxmoxClient(ProxmoxClientBase):
     """Proxmox API Client."""
 
     def __init__(self) -> None:
@@ -35,9 +230,17 @@ class ProxmoxClient:
                 "https://pypi.org/project/proxmoxer/"
             )
 
-        self.config = SingleConfig()
-        self.log = SingleLog()
-        self.logger = self.log.logger
+        super().__init__()
+        self.adapter = TimeoutHTTPAdapter(
+            self.config.config["pve"]["request_timeout"],
+            pool_connections=1,
+            pool_maxsize=self.config.config["pve"]["pool_size"],
+            pool_block=to_bool(self.config.config["pve"]["pool_block"]),
+        )
+        PVE_CONNECTIONS.labels("active").set_function(
+            lambda: self._get_connection_stats()["active"]
+        )
+        PVE_CONNECTIONS.labels("idle").set_function(lambda: self._get_connection_stats()["idle"])
         self.client = self._auth()
         self.logger.debug("Successfully authenticated")
         self.host_list = HostList()
@@ -53,7 +256,7 @@ class ProxmoxClient:
 
             if self.config.config["pve"]["token_name"]:
                 self.logger.debug("Using token login")
-                return ProxmoxAPI(
+                client = ProxmoxAPI(
                     self.config.config["pve"]["server"],
                     user=self.config.config["pve"]["user"],
                     token_name=self.config.config["pve"]["token_name"],
@@ -61,49 +264,111 @@ class ProxmoxClient:
                     verify_ssl=to_bool(self.config.config["pve"]["verify_ssl"]),
                     timeout=self.config.config["pve"]["auth_timeout"],
                 )
+            else:
+                client = ProxmoxAPI(
+                    self.config.config["pve"]["server"],
+                    user=self.config.config["pve"]["user"],
+                    password=self.config.config["pve"]["password"],
+                    verify_ssl=to_bool(self.config.config["pve"]["verify_ssl"]),
+                    timeout=self.config.config["pve"]["auth_timeout"],
+                )
 
-            return ProxmoxAPI(
-                self.config.config["pve"]["server"],
-                user=self.config.config["pve"]["user"],
-                password=self.config.config["pve"]["password"],
-                verify_ssl=to_bool(self.config.config["pve"]["verify_ssl"]),
-                timeout=self.config.config["pve"]["auth_timeout"],
-            )
-        except requests.RequestException as e:
-            PVE_REQUEST_COUNT_ERROR_TOTAL.inc()
-            raise APIError(str(e)) from e
+            # proxmoxer does not expose its requests session, use the internal store
+            session = client._store["session"]
+            session.mount("https://", self.adapter)
+            if not to_bool(self.config.config["pve"]["keep_alive"]):
+                session.headers["Connection"] = "close"
 
-    def _do_request(self, *args: str) -> Any:
-        PVE_REQUEST_COUNT_TOTAL.inc()
-        try:
-            # create a new tuple containing nodes and unpack it again for client.get
-            return self.client.get(*("nodes", *args))
+            return client
         except requests.RequestException as e:
             PVE_REQUEST_COUNT_ERROR_TOTAL.inc()
             raise APIError(str(e)) from e
 
+    def _get_connection_stats(self) -> dict[str, int]:
+        """Count connections currently in use and idle connections kept for reuse."""
+        stats = {"active": 0, "idle": 0}
+        pools = self.adapter.poolmanager.pools
+        # urllib3 pool containers do not support direct iteration
+        for key in pools.keys():  # noqa: SIM118
+            pool = pools.get(key)
+            if pool is None or pool.pool is None:
+                continue
+
+            # The pool queue is pre-filled with placeholders for connections not yet created
+            queued = list(pool.pool.queue)
+            stats["idle"] += sum(1 for conn in queued if conn is not None)
+            stats["active"] += max(pool.pool.maxsize - len(queued), 0)
+
+        return stats
+
+    def _do_request(self, *args: str, retry: bool = True, **params: str) -> Any:
+        key = self._get_cache_key(args, params)
+        cached = self._get_cached(key)
+        if cached is not _MISSING:
+            return cached
+
+        attempt = 0
+        while True:
+            PVE_REQUEST_COUNT_TOTAL.inc()
+            start = perf_counter()
+            try:
+                response = self.client.get(*args, **params)
+            except (requests.RequestException, ResourceException) as e:
+                self._observe_request(args, perf_counter() - start, e)
+                PVE_REQUEST_COUNT_ERROR_TOTAL.inc()
+                delay = self._get_retry_delay(e, attempt) if retry else None
+                if delay is not None:
+                    sleep(delay)
+                    attempt += 1
+                    continue
+                if isinstance(e, ResourceException):
+                    raise
+                if isinstance(e, requests.Timeout):
+                    raise APITimeoutError(str(e)) from e
+                raise APIError(str(e)) from e
+
+            self._observe_request(args, perf_counter() - start)
+            break
+
+        self._set_cached(key, response)
+        return response
+
+    def get_cluster_resources(self) -> Any:
+        self.logger.debug("fetching all nodes and guests from cluster resources")
+        return self._do_request("cluster", "resources")
+
+    def get_cluster_tasks(self) -> Any:
+        self.logger.debug("fetching recent cluster tasks")
+        return self._do_request("cluster", "tasks")
+
     def get_nodes(self) -> Any:
         self.logger.debug("fetching all nodes")
-        return self._do_request()
+        return self._do_request("nodes")
+
+    def get_pool(self, poolid: str) -> Any:
+        self.logger.debug(f"fetching members of pool {poolid}")
+        return self._do_request("pools", poolid)
 
     def get_all_vms(self, pve_node: str) -> Any:
         self.logger.debug(f"fetching all vms on node {pve_node}")
-        return self._do_request(pve_node, "qemu")
+        return self._do_request("nodes", pve_node, "qemu")
 
     def get_all_containers(self, pve_node: str) -> Any:
         self.logger.debug(f"fetching all containers on node {pve_node}")
-        return self._do_request(pve_node, "lxc")
+        return self._do_request("nodes", pve_node, "lxc")
 
     def get_instance_config(self, pve_node: str, pve_type: str, vmid: str) -> Any:
         self.logger.debug(f"fetching instance config for {vmid} on {pve_node}")
-        return self._do_request(pve_node, pve_type, vmid, "config")
+        return self._do_request("nodes", pve_node, pve_type, vmid, "config")
 
     def get_agent_info(self, pve_node: str, pve_type: str, vmid: str) -> Any:
         self.logger.debug(f"fetching agent info for {vmid} on {pve_node}")
-        return self._do_request(pve_node, pve_type, vmid, "agent", "info")["result"]
+        return self._do_request("nodes", pve_node, pve_type, vmid, "agent", "info", retry=False)[
+            "result"
+        ]
 
     def get_network_interfaces(self, pve_node: str, vmid: str) -> Any:
         self.logger.debug(f"fetching network interfaces for {vmid} on {pve_node}")
-        return self._do_request(pve_node, "qemu", vmid, "agent", "network-get-interfaces")[
-            "result"
-        ]
+        return self._do_request(
+            "nodes", pve_node, "qemu", vmid, "agent", "network-get-interfaces", retry=False
+        )["result"]
@@ -47,6 +47,31 @@ class Config:
             "env": "METRICS_PORT",
             "type": environs.Env().int,
         },
+        "metrics.node_labels": {
+            "default": False,
+            "env": "METRICS_NODE_LABELS",
+            "type": environs.Env().bool,
+        },
+        "http_sd.enabled": {
+            "default": False,
+            "env": "HTTP_SD_ENABLED",
+            "type": environs.Env().bool,
+        },
+        "http_sd.address": {
+            "default": "127.0.0.1",
+            "env": "HTTP_SD_ADDRESS",
+            "type": environs.Env().str,
+        },
+        "http_sd.port": {
+            "default": 8001,
+            "env": "HTTP_SD_PORT",
+            "type": environs.Env().int,
+        },
+        "http_sd.path": {
+            "default": "/targets",
+            "env": "HTTP_SD_PATH",
+            "type": environs.Env().str,
+        },
         "config_file": {
             "default": "",
             "env": "CONFIG_FILE",
@@ -76,18 +101,107 @@ class Config:
             "file": True,
             "type": environs.Env().str,
         },
+        "output_file_indent": {
+            "default": 0,
+            "env": "OUTPUT_FILE_INDENT",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "outputs": {
+            "default": [],
+            "file": True,
+            "schema": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "file": {"type": "string"},
+                        "mode": {"type": "string"},
+                        "indent": {"type": ["integer", "null"]},
+                    },
+                    "required": ["file"],
+                    "additionalProperties": False,
+                },
+            },
+        },
         "loop_delay": {
             "default": 300,
             "env": "LOOP_DELAY",
             "file": True,
             "type": environs.Env().int,
         },
+        "loop_jitter": {
+            "default": 0,
+            "env": "LOOP_JITTER",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "loop_max_delay": {
+            "default": 3600,
+            "env": "LOOP_MAX_DELAY",
+            "file": True,
+            "type": environs.Env().int,
+        },
         "service": {
             "default": True,
             "env": "SERVICE",
             "file": True,
             "type": environs.Env().bool,
         },
+        "discovery.stale_max_age": {
+            "default": 3600,
+            "env": "DISCOVERY_STALE_MAX_AGE",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "discovery.workers": {
+            "default": 4,
+            "env": "DISCOVERY_WORKERS",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "discovery.inventory": {
+            "default": "cluster",
+            "env": "DISCOVERY_INVENTORY",
+            "file": True,
+            "type": environs.Env().str,
+        },
+        "discovery.agent_cache_ttl": {
+            "default": 0,
+            "env": "DISCOVERY_AGENT_CACHE_TTL",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "discovery.backend": {
+            "default": "sync",
+            "env": "DISCOVERY_BACKEND",
+            "file": True,
+            "type": environs.Env().str,
+        },
+        "discovery.incremental": {
+            "default": False,
+            "env": "DISCOVERY_INCREMENTAL",
+            "file": True,
+            "type": environs.Env().bool,
+        },
+        "discovery.resync_interval": {
+            "default": 3600,
+            "env": "DISCOVERY_RESYNC_INTERVAL",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "events.enabled": {
+            "default": False,
+            "env": "EVENTS_ENABLED",
+            "file": True,
+            "type": environs.Env().bool,
+        },
+        "events.poll_interval": {
+            "default": 10,
+            "env": "EVENTS_POLL_INTERVAL",
+            "file": True,
+            "type": environs.Env().int,
+        },
         "exclude_state": {
             "default": [],
             "env": "EXCLUDE_STATE",
@@ -118,6 +232,66 @@ class Config:
             "file": True,
             "type": environs.Env().list,
         },
+        "exclude_nodes": {
+            "default": [],
+            "env": "EXCLUDE_NODES",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "include_nodes": {
+            "default": [],
+            "env": "INCLUDE_NODES",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "exclude_pools": {
+            "default": [],
+            "env": "EXCLUDE_POOLS",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "include_pools": {
+            "default": [],
+            "env": "INCLUDE_POOLS",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "exclude_names": {
+            "default": [],
+            "env": "EXCLUDE_NAMES",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "include_names": {
+            "default": [],
+            "env": "INCLUDE_NAMES",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "exclude_tags_regex": {
+            "default": [],
+            "env": "EXCLUDE_TAGS_REGEX",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "include_tags_regex": {
+            "default": [],
+            "env": "INCLUDE_TAGS_REGEX",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "shard.count": {
+            "default": 1,
+            "env": "SHARD_COUNT",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "shard.index": {
+            "default": 0,
+            "env": "SHARD_INDEX",
+            "file": True,
+            "type": environs.Env().int,
+        },
         "pve.server": {
             "default": "",
             "env": "PVE_SERVER",
@@ -154,6 +328,48 @@ class Config:
             "file": True,
             "type": environs.Env().int,
         },
+        "pve.pool_size": {
+            "default": 10,
+            "env": "PVE_POOL_SIZE",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "pve.pool_block": {
+            "default": False,
+            "env": "PVE_POOL_BLOCK",
+            "file": True,
+            "type": environs.Env().bool,
+        },
+        "pve.keep_alive": {
+            "default": True,
+            "env": "PVE_KEEP_ALIVE",
+            "file": True,
+            "type": environs.Env().bool,
+        },
+        "pve.request_timeout": {
+            "default": 10,
+            "env": "PVE_REQUEST_TIMEOUT",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "pve.retries": {
+            "default": 3,
+            "env": "PVE_RETRIES",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "pve.retry_backoff": {
+            "default": 0.5,
+            "env": "PVE_RETRY_BACKOFF",
+            "file": True,
+            "type": environs.Env().float,
+        },
+        "pve.retry_budget": {
+            "default": 50,
+            "env": "PVE_RETRY_BUDGET",
+            "file": True,
+            "type": environs.Env().int,
+        },
         "pve.verify_ssl": {
             "default": True,
             "env": "PVE_VERIFY_SSL",
@@ -203,6 +419,16 @@ class Config:
             normalized = self._add_dict_branch(normalized, key.split("."), item["default"])
 
         self.schema = anyconfig.gen_schema(normalized)
+
+        # Settings that can not be derived from the default value define their own schema
+        for key, item in self.SETTINGS.items():
+            if "schema" in item:
+                branch = self.schema
+                for name in key.split("."):
+                    branch = branch["properties"][name]
+                branch.clear()
+                branch.update(item["schema"])
+
         return normalized
 
     def _get_envs(self) -> dict[str, Any]:
@@ -1,24 +1,137 @@
 #!/usr/bin/env python3
 """Prometheus Discovery."""
 
+import asyncio
 import ipaddress
 import json
-import re
-from collections import defaultdict
-from typing import Any
+import threading
+from collections.abc import Callable, Coroutine, Mapping
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, perf_counter, time
+from typing import Any, TypeVar
 
-from prometheus_client import Gauge, Summary
+from prometheus_client import Counter, Gauge, Histogram, Summary
 
-from prometheuspvesd.client import ProxmoxClient
+from prometheuspvesd.aioclient import AsyncProxmoxClient
+from prometheuspvesd.client import ProxmoxClient, ProxmoxClientBase
 from prometheuspvesd.config import SingleConfig
-from prometheuspvesd.exception import APIError
+from prometheuspvesd.exception import APIError, APITimeoutError
+from prometheuspvesd.filters import GuestFilter
 from prometheuspvesd.logger import SingleLog
 from prometheuspvesd.model import Host, HostList
+from prometheuspvesd.netconfig import parse_net_config
+from prometheuspvesd.utils import to_bool
 
 PROPAGATION_TIME = Summary(
     "pve_sd_propagate_seconds", "Time spent propagating the inventory from PVE"
 )
+PHASE_TIME = Histogram(
+    "pve_sd_phase_seconds",
+    "Time spent in the phases of a discovery loop, the guests phase includes the filter",
+    ["phase"],
+    # Discovery loops of large clusters take minutes
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, float("inf")),
+)
 HOST_GAUGE = Gauge("pve_sd_hosts", "Number of hosts discovered by PVE SD")
+HOST_NODE_GAUGE = Gauge(
+    "pve_sd_hosts_by_node", "Number of hosts discovered by PVE SD by node", ["node"]
+)
+HOST_TYPE_GAUGE = Gauge(
+    "pve_sd_hosts_by_type",
+    "Number of hosts discovered by PVE SD by type and status",
+    ["type", "status"],
+)
+HOST_FILTERED_GAUGE = Gauge(
+    "pve_sd_hosts_filtered",
+    "Number of guests excluded from the last discovery loop by filter reason",
+    ["reason"],
+)
+AGENT_REQUEST_TOTAL = Counter(
+    "pve_sd_agent_requests_total",
+    "Number of guest agent lookups by outcome (ok, cached, disabled, timeout, error)",
+    ["outcome"],
+)
+NODE_UP = Gauge(
+    "pve_sd_node_up",
+    "Whether the last discovery of the node succeeded (1) or failed (0)",
+    ["node"],
+)
+NODE_STALE_SECONDS = Gauge(
+    "pve_sd_node_stale_seconds",
+    "Seconds since the last successful discovery of the node, 0 if it is up",
+    ["node"],
+)
+
+EVENT_TOTAL = Counter(
+    "pve_sd_events_total", "Number of cluster tasks that triggered a targeted refresh", ["type"]
+)
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+# Marker for guests whose config could not be fetched
+_FAILED = object()
+
+# Listing fields that, if changed, require the guest details to be fetched again.
+# Node listings report the CPU count as `cpus`, cluster resources as `maxcpu`.
+FINGERPRINT_FIELDS = (
+    "name",
+    "status",
+    "tags",
+    "template",
+    "lock",
+    "cpus",
+    "maxcpu",
+    "maxmem",
+)
+
+# Cluster task types that add, remove or move guests or change their state.
+EVENT_TASK_TYPES = frozenset(
+    (
+        "qmclone",
+        "qmcreate",
+        "qmdestroy",
+        "qmigrate",
+        "qmreboot",
+        "qmrestore",
+        "qmshutdown",
+        "qmstart",
+        "qmstop",
+        "vzclone",
+        "vzcreate",
+        "vzdestroy",
+        "vzmigrate",
+        "vzreboot",
+        "vzrestore",
+        "vzshutdown",
+        "vzstart",
+        "vzstop",
+    )
+)
+
+
+class CachedHost:
+    """Host discovered in a previous pass along with its listing fingerprint."""
+
+    def __init__(
+        self, host: Host, node: str, fingerprint: tuple[str, ...], uptime: int, updated: float
+    ) -> None:
+        self.host = host
+        self.node = node
+        self.fingerprint = fingerprint
+        self.uptime = uptime
+        self.updated = updated
+
+
+class CachedAgentAddresses:
+    """Addresses reported by the guest agent in a previous pass."""
+
+    def __init__(
+        self, addresses: tuple[str | None, str | None], uptime: int, updated: float
+    ) -> None:
+        self.addresses = addresses
+        self.uptime = uptime
+        self.updated = updated
 
 
 class Discovery:
@@ -28,8 +141,26 @@ class Discovery:
         self.config = SingleConfig()
         self.log = SingleLog()
         self.logger = SingleLog().logger
-        self.client = ProxmoxClient()
+        if self.config.config["discovery"]["backend"] == "async":
+            self.aclient = AsyncProxmoxClient()
+            # The session of the client is bound to the loop, so it is kept between passes
+            self.loop = asyncio.new_event_loop()
+        else:
+            self.client = ProxmoxClient()
         self.host_list = HostList()
+        self.host_cache: dict[tuple[str, str], CachedHost] = {}
+        self.agent_cache: dict[tuple[str, str], CachedAgentAddresses] = {}
+        self.last_resync: float | None = None
+        self.guest_filter: GuestFilter | None = None
+        self.pool_members: dict[str, str] = {}
+        self.node_status: dict[str, bool] = {}
+        self.node_last_success: dict[str, float] = {}
+        self.events_since = time()
+        self.filter_time = 0.0
+        self.filter_excluded: dict[str, int] = {}
+        self.gauge_labels: dict[Gauge, set[tuple[str, ...]]] = {}
+        self._stats_lock = threading.Lock()
+        self.events_seen: set[str] = set()
 
     def _get_names(self, pve_list: list[dict[str, str]], pve_type: str) -> list[str]:
         names: list[str] = []
@@ -56,104 +187,189 @@ class Discovery:
 
         return variables
 
+    def _is_agent_enabled(self, config: Any, status: str | None) -> bool:
+        """
+        Check if guest agent requests can succeed based on the config and listing status.
+
+        The `agent` option is either a plain boolean or a property string like
+        `enabled=1,fstrim_cloned_disks=1`.
+        """
+        if status is not None and status != "running":
+            return False
+
+        if not isinstance(config, dict):
+            return False
+
+        for option in str(config.get("agent", "0")).split(","):
+            key, _, value = option.rpartition("=")
+            if key in ("", "enabled"):
+                try:
+                    return to_bool(value)
+                except ValueError:
+                    return False
+
+        return False
+
+    def _count_agent_error(self, error: Exception) -> None:
+        # The PVE API reports unresponsive agents as server error with a timeout message
+        if isinstance(error, APITimeoutError) or "timeout" in str(error).lower():
+            AGENT_REQUEST_TOTAL.labels("timeout").inc()
+        else:
+            AGENT_REQUEST_TOTAL.labels("error").inc()
+
+    def _get_cached_agent_addresses(
+        self, pve_node: str, vmid: str, host_meta: dict[str, str]
+    ) -> tuple[str | None, str | None] | None:
+        """
+        Return the guest agent addresses of a previous pass if they are not expired.
+
+        Cached addresses are discarded after `discovery.agent_cache_ttl` seconds or if the
+        uptime of the guest went backwards, which would indicate a restart.
+        """
+        ttl = self.config.config["discovery"]["agent_cache_ttl"]
+        cached = self.agent_cache.get((pve_node, str(vmid)))
+        if cached is None or monotonic() - cached.updated >= ttl:
+            return None
+
+        if int(host_meta.get("proxmox_uptime") or 0) < cached.uptime:
+            return None
+
+        AGENT_REQUEST_TOTAL.labels("cached").inc()
+        return cached.addresses
+
+    def _set_cached_agent_addresses(
+        self,
+        pve_node: str,
+        vmid: str,
+        host_meta: dict[str, str],
+        addresses: tuple[str | None, str | None],
+    ) -> None:
+        if self.config.config["discovery"]["agent_cache_ttl"] > 0:
+            self.agent_cache[(pve_node, str(vmid))] = CachedAgentAddresses(
+                addresses, int(host_meta.get("proxmox_uptime") or 0), monotonic()
+            )
+
+    def _check_agent_addresses(
+        self, pve_type: str, pve_node: str, vmid: str, config: Any, host_meta: dict[str, str]
+    ) -> tuple[str | None, str | None] | None:
+        """
+        Return the guest agent addresses if they are known without requesting the agent.
+
+        :returns: Tuple of IPv4 and IPv6 address for guests without an enabled agent or with
+            cached addresses, None if the agent has to be requested
+        """
+        if pve_type != "qemu" or config is _FAILED:
+            return None, None
+
+        if not self._is_agent_enabled(config, host_meta.get("proxmox_status")):
+            AGENT_REQUEST_TOTAL.labels("disabled").inc()
+            return None, None
+
+        return self._get_cached_agent_addresses(pve_node, vmid, host_meta)
+
+    def _set_agent_networks(
+        self, pve_node: str, vmid: str, host_meta: dict[str, str], networks: Any
+    ) -> tuple[str | None, str | None]:
+        AGENT_REQUEST_TOTAL.labels("ok").inc()
+        addresses = self._parse_agent_addresses(networks)
+        self._set_cached_agent_addresses(pve_node, vmid, host_meta, addresses)
+        return addresses
+
+    def _get_agent_addresses(
+        self, pve_type: str, pve_node: str, vmid: str, config: Any, host_meta: dict[str, str]
+    ) -> tuple[str | None, str | None]:
+        addresses = self._check_agent_addresses(pve_type, pve_node, vmid, config, host_meta)
+        if addresses is not None:
+            return addresses
+
+        networks: Any = None
+        try:
+            if self.client.get_agent_info(pve_node, pve_type, vmid) is not None:
+                networks = self.client.get_network_interfaces(pve_node, vmid)
+        except Exception as e:  # noqa: BLE001
+            self._count_agent_error(e)
+            return None, None
+
+        return self._set_agent_networks(pve_node, vmid, host_meta, networks)
+
+    async def _get_agent_addresses_async(
+        self, pve_type: str, pve_node: str, vmid: str, config: Any, host_meta: dict[str, str]
+    ) -> tuple[str | None, str | None]:
+        addresses = self._check_agent_addresses(pve_type, pve_node, vmid, config, host_meta)
+        if addresses is not None:
+            return addresses
+
+        networks: Any = None
+        try:
+            if await self.aclient.get_agent_info(pve_node, pve_type, vmid) is not None:
+                networks = await self.aclient.get_network_interfaces(pve_node, vmid)
+        except Exception as e:  # noqa: BLE001
+            self._count_agent_error(e)
+            return None, None
+
+        return self._set_agent_networks(pve_node, vmid, host_meta, networks)
+
     def _get_ip_addresses(
-        self, pve_type: str, pve_node: str, vmid: str
+        self, pve_type: str, pve_node: str, vmid: str, host_meta: dict[str, str] | None = None
     ) -> tuple[str | None, str | None]:
+        config = self.client.get_instance_config(pve_node, pve_type, vmid)
+        addresses = self._get_agent_addresses(pve_type, pve_node, vmid, config, host_meta or {})
+
+        return self._parse_ip_addresses(config, addresses)
+
+    def _parse_agent_addresses(self, networks: Any) -> tuple[str | None, str | None]:
         ipv4_address: str | None = None
         ipv6_address: str | None = None
-        networks: list[dict[str, Any]] | None = None
-        if pve_type == "qemu":
-            # If qemu agent is enabled, try to gather the IP address
-            try:
-                if self.client.get_agent_info(pve_node, pve_type, vmid) is not None:
-                    networks = self.client.get_network_interfaces(pve_node, vmid)
-            except Exception:  # noqa
-                pass
-
-            if isinstance(networks, list):
-                for network in networks:
-                    for ip_address in network.get("ip-addresses", []):
-                        if ip_address["ip-address-type"] == "ipv4" and not ipv4_address:
-                            ipv4_address = self._validate_ip(ip_address["ip-address"])
-                        elif ip_address["ip-address-type"] == "ipv6" and not ipv6_address:
-                            ipv6_address = self._validate_ip(ip_address["ip-address"])
 
-        config = self.client.get_instance_config(pve_node, pve_type, vmid)
-        if config and not ipv4_address:
-            try:
-                if "ipconfig0" in config:
-                    sources = [config["net0"], config["ipconfig0"]]
-                else:
-                    sources = [config["net0"]]
-
-                for s in sources:
-                    find = re.search(r"ip=(\d*\.\d*\.\d*\.\d*)", str(s))
-                    if find and find.group(1):
-                        ipv4_address = find.group(1)
-                        break
-            except Exception:  # noqa
-                pass
-
-        if config and not ipv6_address:
-            try:
-                if "ipconfig0" in config:
-                    sources = [config["net0"], config["ipconfig0"]]
-                else:
-                    sources = [config["net0"]]
-
-                for s in sources:
-                    find = re.search(
-                        r"ip=(([a-fA-F0-9]{0,4}:{0,2}){0,7}:[0-9a-fA-F]{1,4})", str(s)
-                    )
-                    if find and find.group(1):
-                        ipv6_address = find.group(1)
-                        break
-            except Exception:  # noqa
-                pass
+        if isinstance(networks, list):
+            for network in networks:
+                for ip_address in network.get("ip-addresses", []):
+                    if ip_address["ip-address-type"] == "ipv4" and not ipv4_address:
+                        ipv4_address = self._validate_ip(ip_address["ip-address"])
+                    elif ip_address["ip-address-type"] == "ipv6" and not ipv6_address:
+                        ipv6_address = self._validate_ip(ip_address["ip-address"])
 
         return ipv4_address, ipv6_address
 
-    def _filter(self, pve_list: list[dict[str, Any]]) -> list[dict[str, Any]]:
-        filtered: list[dict[str, Any]] = []
-        for item in pve_list:
-            obj = defaultdict(dict, item)
-            tags: list[str] = []
-            tags_excl = self.config.config["exclude_tags"]
-
-            if isinstance(obj["tags"], str):
-                tags = obj["tags"].split(";")
-                self.logger.debug(f"vmid {obj['vmid']}: discovered tags: {tags}")
-
-            if (
-                len(self.config.config["include_vmid"]) > 0
-                and str(obj["vmid"]) not in self.config.config["include_vmid"]
-            ):
-                continue
+    def _parse_ip_addresses(
+        self, config: Any, addresses: tuple[str | None, str | None]
+    ) -> tuple[str | None, str | None]:
+        ipv4_address, ipv6_address = addresses
 
-            if len(self.config.config["include_tags"]) > 0 and (
-                bool(obj["tags"]) is False  # continue if tags is not set
-                or set(tags).isdisjoint(self.config.config["include_tags"])
-            ):
-                continue
+        if config and not (ipv4_address and ipv6_address):
+            for key in ("net0", "ipconfig0"):
+                try:
+                    net_config = parse_net_config(str(config[key]))
+                except (KeyError, TypeError):
+                    continue
 
-            if obj["template"] == 1:
-                continue
+                ipv4_address = ipv4_address or net_config.ip
+                ipv6_address = ipv6_address or net_config.ip6
 
-            if obj["status"] in map(str, self.config.config["exclude_state"]):
-                continue
+        return ipv4_address, ipv6_address
 
-            if str(obj["vmid"]) in self.config.config["exclude_vmid"]:
-                continue
+    def _get_filter(self) -> GuestFilter:
+        # Recompile the filter if the filter options have been changed since the last pass
+        if (
+            self.guest_filter is None
+            or GuestFilter.get_options(self.config.config) != self.guest_filter.options
+        ):
+            self.guest_filter = GuestFilter(self.config.config)
 
-            if isinstance(obj["tags"], str) and not set(tags).isdisjoint(tags_excl):
-                self.logger.debug(
-                    f"vmid {obj['vmid']}: "
-                    f"excluded by tags: {list(set(tags).intersection(tags_excl))}"
-                )
-                continue
+        return self.guest_filter
 
-            filtered.append(item.copy())
-        return filtered
+    def _filter(self, pve_list: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        start = perf_counter()
+        excluded: dict[str, int] = {}
+        try:
+            return self._get_filter().apply(pve_list, excluded)
+        finally:
+            # Node listings are filtered concurrently, the totals are observed at the end
+            # of the pass
+            with self._stats_lock:
+                self.filter_time += perf_counter() - start
+                for reason, count in excluded.items():
+                    self.filter_excluded[reason] = self.filter_excluded.get(reason, 0) + count
 
     def _validate_ip(self, address: str) -> str | None:
         try:
@@ -166,69 +382,664 @@ class Discovery:
         except ValueError:
             return None
 
-    @PROPAGATION_TIME.time()
-    def propagate(self) -> HostList:
-        self.host_list.clear()
-        nodelist = self._get_names(self.client.get_nodes(), "node")
-        self.logger.info(f"Discovered nodes: {','.join(nodelist)}")
-        for node in nodelist:
+    def _map(self, func: Callable[[_T], _R], items: list[_T]) -> list[_R]:
+        """
+        Apply a function to all items using the configured number of workers.
+
+        Results are returned in the order of the input items, regardless of the order
+        in which the workers complete them.
+
+        :param func: Function to apply to every item
+        :param items: List of items
+        :returns: List of results
+        """
+        workers = min(self.config.config["discovery"]["workers"], len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pve-sd") as executor:
+            futures = [executor.submit(func, item) for item in items]
             try:
-                qemu_list = self._filter(self.client.get_all_vms(node))
-                container_list = self._filter(self.client.get_all_containers(node))
-            except Exception as e:
-                raise APIError(str(e)) from e
+                return [future.result() for future in futures]
+            except BaseException:
+                for future in futures:
+                    future.cancel()
+                raise
+
+    async def _map_async(
+        self, func: Callable[[_T], Coroutine[Any, Any, _R]], items: list[_T]
+    ) -> list[_R]:
+        """
+        Await a coroutine function for all items with bounded concurrency.
+
+        At most `discovery.workers` coroutines are running at the same time. Results are
+        returned in the order of the input items.
+
+        :param func: Coroutine function to apply to every item
+        :param items: List of items
+        :returns: List of results
+        """
+        semaphore = asyncio.Semaphore(max(self.config.config["discovery"]["workers"], 1))
+
+        async def run(item: _T) -> _R:
+            async with semaphore:
+                return await func(item)
+
+        tasks = [asyncio.ensure_future(run(item)) for item in items]
+        try:
+            return list(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def _merge_instances(
+        self, qemu_list: list[dict[str, Any]], container_list: list[dict[str, Any]]
+    ) -> dict[str, dict[str, str]]:
+        if self.pool_members:
+            self._set_pools([*qemu_list, *container_list])
+
+        # Merge QEMU and Containers lists from this node
+        instances = self._get_variables(self._filter(qemu_list), "qemu").copy()
+        instances.update(self._get_variables(self._filter(container_list), "container"))
+
+        return instances
+
+    def _get_instances(self, node: str) -> dict[str, dict[str, str]] | None:
+        try:
+            listings = self.client.get_all_vms(node), self.client.get_all_containers(node)
+        except Exception as e:  # noqa: BLE001
+            self._set_node_failed(node, e)
+            return None
+
+        return self._merge_instances(*listings)
+
+    async def _get_instances_async(self, node: str) -> dict[str, dict[str, str]] | None:
+        try:
+            listings = await asyncio.gather(
+                self.aclient.get_all_vms(node), self.aclient.get_all_containers(node)
+            )
+        except Exception as e:  # noqa: BLE001
+            self._set_node_failed(node, e)
+            return None
+
+        return self._merge_instances(*listings)
+
+    def _build_host(
+        self,
+        node: str,
+        host_meta: dict[str, str],
+        config: Any,
+        addresses: tuple[str | None, str | None],
+    ) -> Host:
+        vmid = host_meta["proxmox_vmid"]
+        hostname = host_meta["proxmox_name"]
+        pve_type = host_meta.get("proxmox_type", "qemu")
+
+        try:
+            description = config["description"]
+        except KeyError:
+            description = None
+        except Exception as e:
+            raise APIError(str(e)) from e
+
+        try:
+            metadata = json.loads(description)
+        except TypeError:
+            metadata = {}
+        except ValueError:
+            metadata = {"notes": description}
+
+        ipv4_address, ipv6_address = addresses
+
+        prom_host = Host(vmid, hostname, ipv4_address, ipv6_address, pve_type, node)
+
+        config_flags = [("cpu", "sockets"), ("cores", "cores"), ("memory", "memory")]
+        meta_flags = [("status", "proxmox_status"), ("tags", "proxmox_tags")]
 
-            # Merge QEMU and Containers lists from this node
-            instances = self._get_variables(qemu_list, "qemu").copy()
-            instances.update(self._get_variables(container_list, "container"))
+        for key, flag in config_flags:
+            if flag in config:
+                prom_host.add_label(key, config[flag])
 
-            HOST_GAUGE.set(len(instances))
+        for key, flag in meta_flags:
+            if flag in host_meta:
+                prom_host.add_label(key, host_meta[flag])
+
+        if "groups" in metadata:
+            prom_host.add_label("groups", ",".join(metadata["groups"]))
+
+        return prom_host
+
+    def _get_instance_config(self, guest: tuple[str, dict[str, str]]) -> Any:
+        node, host_meta = guest
+        try:
+            return self.client.get_instance_config(
+                node, host_meta.get("proxmox_type", "qemu"), host_meta["proxmox_vmid"]
+            )
+        except Exception as e:  # noqa: BLE001
+            self._set_guest_failed(guest, e)
+            return _FAILED
+
+    async def _get_instance_config_async(self, guest: tuple[str, dict[str, str]]) -> Any:
+        node, host_meta = guest
+        try:
+            return await self.aclient.get_instance_config(
+                node, host_meta.get("proxmox_type", "qemu"), host_meta["proxmox_vmid"]
+            )
+        except Exception as e:  # noqa: BLE001
+            self._set_guest_failed(guest, e)
+            return _FAILED
+
+    def _get_guest_addresses(
+        self, item: tuple[tuple[str, dict[str, str]], Any]
+    ) -> tuple[str | None, str | None]:
+        (node, host_meta), config = item
+        return self._get_agent_addresses(
+            host_meta.get("proxmox_type", "qemu"),
+            node,
+            host_meta["proxmox_vmid"],
+            config,
+            host_meta,
+        )
+
+    async def _get_guest_addresses_async(
+        self, item: tuple[tuple[str, dict[str, str]], Any]
+    ) -> tuple[str | None, str | None]:
+        (node, host_meta), config = item
+        return await self._get_agent_addresses_async(
+            host_meta.get("proxmox_type", "qemu"),
+            node,
+            host_meta["proxmox_vmid"],
+            config,
+            host_meta,
+        )
+
+    def _build_hosts(
+        self,
+        guests: list[tuple[str, dict[str, str]]],
+        configs: list[Any],
+        addresses: list[tuple[str | None, str | None]],
+    ) -> list[Host | None]:
+        hosts: list[Host | None] = []
+        for guest, config, guest_addresses in zip(guests, configs, addresses, strict=True):
+            if config is _FAILED:
+                hosts.append(None)
+                continue
+
+            node, host_meta = guest
+            try:
+                hosts.append(
+                    self._build_host(
+                        node, host_meta, config, self._parse_ip_addresses(config, guest_addresses)
+                    )
+                )
+            except Exception as e:  # noqa: BLE001
+                self._set_guest_failed(guest, e)
+                hosts.append(None)
+
+        return hosts
+
+    def _set_node_failed(self, node: str, error: Exception) -> None:
+        self.node_status[node] = False
+        self.logger.warning(f"{node}: Discovery failed: {str(error).strip()}")
+
+    def _set_guest_failed(self, guest: tuple[str, dict[str, str]], error: Exception) -> None:
+        # Only the guest keeps its last-known-good host, the node itself is still up
+        node, host_meta = guest
+        vmid = host_meta["proxmox_vmid"]
+        self.logger.warning(f"{node}: Discovery of {vmid} failed: {str(error).strip()}")
+
+    def _set_pools(self, pve_list: list[dict[str, Any]]) -> None:
+        # Node listings don't contain the pool of a guest, take it from the pool members
+        for item in pve_list:
+            pool = self.pool_members.get(str(item.get("vmid")))
+            if pool is not None:
+                item["pool"] = pool
+
+    def _get_pool_ids(self) -> list[str]:
+        guest_filter = self._get_filter()
+        return sorted(guest_filter.include_pools | guest_filter.exclude_pools)
+
+    def _get_members(self, poolid: str, pool: Any) -> list[dict[str, Any]]:
+        members = [
+            {**member, "pool": poolid}
+            for member in pool.get("members", [])
+            if member.get("type") in ("qemu", "lxc")
+        ]
+        for member in members:
+            self.pool_members[str(member["vmid"])] = poolid
+
+        return members
+
+    def _check_pool_error(self, poolid: str, error: Exception) -> None:
+        """
+        Skip pools that do not exist and fail the pass for all other errors.
+
+        Without the members of a pool, guests of included pools would be dropped and guests of
+        excluded pools would be published, so the targets of the previous pass are kept.
+        """
+        # PVE reports unknown pools as server error
+        if getattr(error, "status_code", None) == 404 or "does not exist" in str(error):
+            self.logger.warning(f"Pool {poolid} does not exist")
+            return
+
+        raise APIError(
+            f"Unable to fetch members of pool {poolid}: {str(error).strip()}"
+        ) from error
+
+    def _get_pool_members(self) -> list[dict[str, Any]]:
+        members: list[dict[str, Any]] = []
+        for poolid in self._get_pool_ids():
+            try:
+                pool = self.client.get_pool(poolid)
+            except Exception as e:  # noqa: BLE001
+                self._check_pool_error(poolid, e)
+                continue
+
+            members.extend(self._get_members(poolid, pool))
+
+        return members
+
+    async def _get_pool_members_async(self) -> list[dict[str, Any]]:
+        members: list[dict[str, Any]] = []
+        for poolid in self._get_pool_ids():
+            try:
+                pool = await self.aclient.get_pool(poolid)
+            except Exception as e:  # noqa: BLE001
+                self._check_pool_error(poolid, e)
+                continue
+
+            members.extend(self._get_members(poolid, pool))
+
+        return members
+
+    def _get_nodelist(self, nodes: Any) -> list[str]:
+        guest_filter = self._get_filter()
+        nodelist = [
+            node for node in self._get_names(nodes, "node") if guest_filter.is_node_included(node)
+        ]
+        self.logger.info(f"Discovered nodes: {','.join(nodelist)}")
+
+        return nodelist
+
+    def _get_node_guests(self) -> list[tuple[str, dict[str, str]]]:
+        members = self._get_pool_members()
+        if self._get_filter().include_pools:
+            # Only members of the included pools can pass, no need to list the nodes
+            return self._group_cluster_guests(members)
+
+        nodelist = self._get_nodelist(self.client.get_nodes())
+        return self._get_guest_list(nodelist, self._map(self._get_instances, nodelist))
+
+    async def _get_node_guests_async(self) -> list[tuple[str, dict[str, str]]]:
+        members = await self._get_pool_members_async()
+        if self._get_filter().include_pools:
+            # Only members of the included pools can pass, no need to list the nodes
+            return self._group_cluster_guests(members)
+
+        nodelist = self._get_nodelist(await self.aclient.get_nodes())
+        return self._get_guest_list(
+            nodelist, await self._map_async(self._get_instances_async, nodelist)
+        )
+
+    def _get_offline_nodes(self, resources: Any) -> list[str]:
+        # Cluster resources list every node with its state, guests of nodes that are not
+        # online are handled like guests of a failed node listing
+        guest_filter = self._get_filter()
+        offline: list[str] = []
+        for item in resources:
+            if item.get("type") != "node" or not guest_filter.is_node_included(item["node"]):
+                continue
+
+            self.node_status[item["node"]] = item.get("status") == "online"
+            if not self.node_status[item["node"]]:
+                self.logger.warning(f"{item['node']}: Node is {item.get('status')}")
+                offline.append(item["node"])
+
+        return offline
+
+    def _group_cluster_guests(self, resources: Any) -> list[tuple[str, dict[str, str]]]:
+        inventory: dict[str, dict[str, dict[str, str]] | None] = dict.fromkeys(
+            self._get_offline_nodes(resources)
+        )
+        guests = [item for item in resources if item.get("type") in ("qemu", "lxc")]
+        for vmid, host_meta in self._get_variables(self._filter(guests), "qemu").items():
+            instances = inventory.setdefault(str(host_meta["proxmox_node"]), {})
+            if instances is not None:
+                instances[vmid] = host_meta
+
+        self.logger.info(f"Discovered nodes: {','.join(inventory)}")
+        return self._get_guest_list(list(inventory), list(inventory.values()))
+
+    def _get_guest_list(
+        self, nodelist: list[str], listings: list[dict[str, dict[str, str]] | None]
+    ) -> list[tuple[str, dict[str, str]]]:
+        guests: list[tuple[str, dict[str, str]]] = []
+        for node, instances in zip(nodelist, listings, strict=True):
+            if instances is None:
+                continue
+
+            self.node_status.setdefault(node, True)
             self.logger.info(f"{node}: Found {len(instances)} targets")
-            for vmid_key in instances:
-                host_meta = instances[vmid_key]
-                vmid = host_meta["proxmox_vmid"]
-                hostname = host_meta["proxmox_name"]
+            guests.extend((node, host_meta) for host_meta in instances.values())
 
-                try:
-                    pve_type = host_meta["proxmox_type"]
-                except KeyError:
-                    pve_type = "qemu"
+        return guests
 
-                config = self.client.get_instance_config(node, pve_type, vmid)
+    def _log_inventory_fallback(self, error: Exception) -> None:
+        self.logger.warning(
+            f"Unable to fetch cluster resources, using node listings: {str(error).strip()}"
+        )
 
-                try:
-                    description = config["description"]
-                except KeyError:
-                    description = None
-                except Exception as e:
-                    raise APIError(str(e)) from e
+    def _get_guests(self) -> list[tuple[str, dict[str, str]]]:
+        if self.config.config["discovery"]["inventory"] == "cluster":
+            try:
+                return self._group_cluster_guests(self.client.get_cluster_resources())
+            except Exception as e:  # noqa: BLE001
+                self._log_inventory_fallback(e)
 
-                try:
-                    metadata = json.loads(description)
-                except TypeError:
-                    metadata = {}
-                except ValueError:
-                    metadata = {"notes": description}
+        return self._get_node_guests()
+
+    async def _get_guests_async(self) -> list[tuple[str, dict[str, str]]]:
+        if self.config.config["discovery"]["inventory"] == "cluster":
+            try:
+                return self._group_cluster_guests(await self.aclient.get_cluster_resources())
+            except Exception as e:  # noqa: BLE001
+                self._log_inventory_fallback(e)
+
+        return await self._get_node_guests_async()
+
+    def _get_fingerprint(self, node: str, host_meta: dict[str, str]) -> tuple[str, ...]:
+        return (node, *(str(host_meta.get(f"proxmox_{key}", "")) for key in FINGERPRINT_FIELDS))
+
+    def _get_cached_host(self, node: str, host_meta: dict[str, str]) -> Host | None:
+        """
+        Return the host of the previous pass if the guest listing has not changed.
+
+        A guest is considered unchanged if its listing fingerprint is the same and its
+        uptime did not go backwards, which would indicate a restart.
+        """
+        key = (host_meta.get("proxmox_type", "qemu"), str(host_meta["proxmox_vmid"]))
+        cached = self.host_cache.get(key)
+        if cached is None or cached.fingerprint != self._get_fingerprint(node, host_meta):
+            return None
+
+        if int(host_meta.get("proxmox_uptime") or 0) < cached.uptime:
+            return None
+
+        return cached.host
+
+    def _is_full_pass(self) -> bool:
+        if not self.config.config["discovery"]["incremental"]:
+            return True
+
+        now = monotonic()
+        if (
+            self.last_resync is None
+            or now - self.last_resync >= self.config.config["discovery"]["resync_interval"]
+        ):
+            self.last_resync = now
+            return True
 
-                ipv4_address, ipv6_address = self._get_ip_addresses(pve_type, node, vmid)
+        return False
 
-                prom_host = Host(vmid, hostname, ipv4_address, ipv6_address, pve_type)
+    def _get_missing_guests(
+        self, guests: list[tuple[str, dict[str, str]]], refresh: set[str] | None = None
+    ) -> tuple[list[Host | None], list[tuple[str, dict[str, str]]]]:
+        """
+        Look up unchanged hosts of the previous pass.
 
-                config_flags = [("cpu", "sockets"), ("cores", "cores"), ("memory", "memory")]
-                meta_flags = [("status", "proxmox_status"), ("tags", "proxmox_tags")]
+        :param guests: List of guests as tuple of node and listing metadata
+        :param refresh: Optional VMIDs to fetch again, all other unchanged hosts are reused
+        :returns: Tuple of reusable hosts (or None) for all guests and guests to be fetched
+        """
+        full_pass = refresh is None and self._is_full_pass()
+        refresh = refresh or set()
+        cached = [
+            None
+            if full_pass or str(host_meta["proxmox_vmid"]) in refresh
+            else self._get_cached_host(node, host_meta)
+            for node, host_meta in guests
+        ]
+        missing = [guest for guest, host in zip(guests, cached, strict=True) if host is None]
+        if not full_pass:
+            self.logger.info(f"Reusing {len(guests) - len(missing)} unchanged targets")
 
-                for key, flag in config_flags:
-                    if flag in config:
-                        prom_host.add_label(key, config[flag])
+        return cached, missing
 
-                for key, flag in meta_flags:
-                    if flag in host_meta:
-                        prom_host.add_label(key, host_meta[flag])
+    def _update_host_list(
+        self,
+        guests: list[tuple[str, dict[str, str]]],
+        cached: list[Host | None],
+        fetched: list[Host | None],
+    ) -> HostList:
+        """
+        Rebuild the host list and cache from the results of the current pass.
 
-                if "groups" in metadata:
-                    prom_host.add_label("groups", ",".join(metadata["groups"]))
+        Guests of failed node listings and guests whose details could not be fetched keep
+        their last-known-good host for up to `discovery.stale_max_age` seconds. These hosts
+        are marked with the `stale` label. A node is considered failed if its listing failed,
+        cluster resources report it as not online or the details of all its fetched guests
+        could not be fetched.
+        """
+        now = monotonic()
+        self.host_list.clear()
+        remaining = iter(fetched)
+        host_cache: dict[tuple[str, str], CachedHost] = {}
+        failed_keys: set[tuple[str, str]] = set()
+        node_failed: dict[str, bool] = {}
+        for (node, host_meta), host in zip(guests, cached, strict=True):
+            key = (host_meta.get("proxmox_type", "qemu"), str(host_meta["proxmox_vmid"]))
+            prom_host = host if host is not None else next(remaining)
+            if host is None:
+                node_failed[node] = node_failed.get(node, True) and prom_host is None
+            if prom_host is None:
+                failed_keys.add(key)
+                continue
+
+            self.host_list.add_host(prom_host)
+            self.logger.debug(f"Discovered {prom_host}")
+
+            host_cache[key] = CachedHost(
+                prom_host,
+                node,
+                self._get_fingerprint(node, host_meta),
+                int(host_meta.get("proxmox_uptime") or 0),
+                now,
+            )
+
+        for node, failed in node_failed.items():
+            if failed:
+                self.node_status[node] = False
+                self.logger.warning(f"{node}: Discovery of all guests failed")
+
+        failed_nodes = {node for node, status in self.node_status.items() if not status}
+        stale_max_age = self.config.config["discovery"]["stale_max_age"]
+        for key, previous in self.host_cache.items():
+            if key in host_cache or (previous.node not in failed_nodes and key not in failed_keys):
+                continue
 
-                self.host_list.add_host(prom_host)
-                self.logger.debug(f"Discovered {prom_host}")
+            if now - previous.updated > stale_max_age:
+                self.logger.info(f"{previous.node}: Evicting stale target {previous.host}")
+                continue
+
+            stale_host = previous.host.copy()
+            stale_host.add_label("stale", "true")
+            self.host_list.add_host(stale_host)
+            host_cache[key] = previous
+            self.logger.debug(f"Reusing stale {stale_host}")
 
+        self.host_cache = host_cache
+        self._prune_agent_cache(guests, now)
+        self._update_node_status(now)
+        self._update_host_gauges()
         return self.host_list
+
+    def _prune_agent_cache(self, guests: list[tuple[str, dict[str, str]]], now: float) -> None:
+        # Drop expired addresses as well as addresses of removed or migrated guests
+        ttl = self.config.config["discovery"]["agent_cache_ttl"]
+        current = {(node, str(host_meta["proxmox_vmid"])) for node, host_meta in guests}
+        self.agent_cache = {
+            key: cached
+            for key, cached in self.agent_cache.items()
+            if key in current and now - cached.updated < ttl
+        }
+
+    def _update_node_status(self, now: float) -> None:
+        for node in self.node_last_success.keys() - self.node_status.keys():
+            NODE_UP.remove(node)
+            NODE_STALE_SECONDS.remove(node)
+            del self.node_last_success[node]
+
+        for node, status in self.node_status.items():
+            if status:
+                self.node_last_success[node] = now
+
+            NODE_UP.labels(node).set(int(status))
+            NODE_STALE_SECONDS.labels(node).set(now - self.node_last_success.get(node, now))
+
+    def _finish_pass(
+        self,
+        guests: list[tuple[str, dict[str, str]]],
+        cached: list[Host | None],
+        missing: list[tuple[str, dict[str, str]]],
+        configs: list[Any],
+        addresses: list[tuple[str | None, str | None]],
+    ) -> HostList:
+        PHASE_TIME.labels("filter").observe(self.filter_time)
+        with PHASE_TIME.labels("update").time():
+            fetched = self._build_hosts(missing, configs, addresses)
+            return self._update_host_list(guests, cached, fetched)
+
+    def _get_event_vmids(self, tasks: list[dict[str, Any]]) -> set[str]:
+        """
+        Return the VMIDs of guests affected by tasks that finished since the last poll.
+
+        Tasks are tracked by the end time reported by PVE and their UPID, so tasks that
+        finished within the same second as the last poll are not reported twice.
+        """
+        since = self.events_since
+        latest = since
+        seen: set[str] = set()
+        vmids: set[str] = set()
+        for task in tasks:
+            endtime = task.get("endtime")
+            if not endtime or endtime < since:
+                continue
+
+            upid = str(task.get("upid"))
+            seen.add(upid)
+            if upid in self.events_seen:
+                continue
+
+            latest = max(latest, endtime)
+            task_type = task.get("type")
+            if task_type in EVENT_TASK_TYPES and task.get("id"):
+                self.logger.debug(
+                    f"{task.get('node')}: Task {task_type} finished for {task['id']}"
+                )
+                EVENT_TOTAL.labels(task_type).inc()
+                vmids.add(str(task["id"]))
+
+        self.events_since = latest
+        self.events_seen = seen
+        return vmids
+
+    async def _get_cluster_tasks_async(self) -> Any:
+        await self.aclient.connect()
+        return await self.aclient.get_cluster_tasks()
+
+    def poll_events(self) -> set[str]:
+        """
+        Poll the cluster task log for guest changes.
+
+        :returns: VMIDs of guests that were created, destroyed, migrated, started or stopped
+            since the last poll
+        """
+        if self.config.config["discovery"]["backend"] == "async":
+            tasks = self.loop.run_until_complete(self._get_cluster_tasks_async())
+        else:
+            tasks = self.client.get_cluster_tasks()
+
+        return self._get_event_vmids(tasks)
+
+    def _set_gauge(self, gauge: Gauge, values: Mapping[tuple[str, ...], int]) -> None:
+        # Remove the series of nodes, types or reasons that are gone since the last pass
+        for labels in self.gauge_labels.get(gauge, set()) - values.keys():
+            gauge.remove(*labels)
+
+        for labels, value in values.items():
+            gauge.labels(*labels).set(value)
+        self.gauge_labels[gauge] = set(values)
+
+    def _update_host_gauges(self) -> None:
+        """Update the inventory gauges from the host list of the pass without API requests."""
+        by_node: dict[tuple[str, ...], int] = {}
+        by_type: dict[tuple[str, ...], int] = {}
+        for host in self.host_list:
+            node = (host.node or "unknown",)
+            by_node[node] = by_node.get(node, 0) + 1
+            pve_type = (host.pve_type, host.get_label("status") or "unknown")
+            by_type[pve_type] = by_type.get(pve_type, 0) + 1
+
+        HOST_GAUGE.set(len(self.host_list))
+        self._set_gauge(HOST_NODE_GAUGE, by_node)
+        self._set_gauge(HOST_TYPE_GAUGE, by_type)
+        self._set_gauge(
+            HOST_FILTERED_GAUGE,
+            {(reason,): count for reason, count in self.filter_excluded.items()},
+        )
+
+    def _start_pass(self, client: ProxmoxClientBase) -> None:
+        self.node_status = {}
+        self.pool_members = {}
+        self.filter_time = 0.0
+        self.filter_excluded = {}
+        client.reset_retry_budget()
+
+    @PROPAGATION_TIME.time()
+    def propagate(self, refresh: set[str] | None = None) -> HostList:
+        """
+        Propagate the inventory from PVE.
+
+        :param refresh: Optional VMIDs for a targeted refresh. Only these guests and guests
+            whose listing changed are fetched, all other hosts of the previous pass are reused.
+        """
+        if self.config.config["discovery"]["backend"] == "async":
+            return self.loop.run_until_complete(self.propagate_async(refresh))
+
+        self._start_pass(self.client)
+        with self.client.request_cache():
+            with PHASE_TIME.labels("guests").time():
+                guests = self._get_guests()
+            cached, missing = self._get_missing_guests(guests, refresh)
+            with PHASE_TIME.labels("config").time():
+                configs = self._map(self._get_instance_config, missing)
+            with PHASE_TIME.labels("agent").time():
+                addresses = self._map(
+                    self._get_guest_addresses, list(zip(missing, configs, strict=True))
+                )
+
+        return self._finish_pass(guests, cached, missing, configs, addresses)
+
+    async def propagate_async(self, refresh: set[str] | None = None) -> HostList:
+        """Propagate the inventory using the asyncio client in the event loop of the discovery."""
+        self._start_pass(self.aclient)
+        await self.aclient.connect()
+        with self.aclient.request_cache():
+            with PHASE_TIME.labels("guests").time():
+                guests = await self._get_guests_async()
+            cached, missing = self._get_missing_guests(guests, refresh)
+            with PHASE_TIME.labels("config").time():
+                configs = await self._map_async(self._get_instance_config_async, missing)
+            with PHASE_TIME.labels("agent").time():
+                addresses = await self._map_async(
+                    self._get_guest_addresses_async, list(zip(missing, configs, strict=True))
+                )
+
+        return self._finish_pass(guests, cached, missing, configs, addresses)
+
+    def close(self) -> None:
+        """Close the session of the asyncio client and its event loop."""
+        if self.config.config["discovery"]["backend"] == "async":
+            self.loop.run_until_complete(self.aclient.close())
+            self.loop.close()
@@ -16,6 +16,12 @@ class APIError(PrometheusSDError):
     pass
 
 
+class APITimeoutError(APIError):
+    """Timeouts of API requests."""
+
+    pass
+
+
 class ConfigError(PrometheusSDError):
     """Errors related to config file handling."""
 
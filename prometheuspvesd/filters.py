@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""Compiled guest filters."""
+
+import fnmatch
+import hashlib
+import logging
+import re
+from collections.abc import Callable, Iterable
+from typing import Any
+
+from prometheuspvesd.exception import ConfigError
+from prometheuspvesd.logger import SingleLog
+
+# Config options the filter is compiled from
+FILTER_OPTIONS = (
+    "include_vmid",
+    "exclude_vmid",
+    "include_tags",
+    "exclude_tags",
+    "exclude_state",
+    "include_nodes",
+    "exclude_nodes",
+    "include_pools",
+    "exclude_pools",
+    "include_names",
+    "exclude_names",
+    "include_tags_regex",
+    "exclude_tags_regex",
+)
+
+Predicate = Callable[[dict[str, Any], frozenset[str]], bool]
+
+
+def get_tags(item: dict[str, Any]) -> list[str]:
+    tags = item.get("tags")
+    if isinstance(tags, str):
+        return tags.split(";")
+
+    return []
+
+
+def compile_globs(patterns: frozenset[str]) -> re.Pattern[str]:
+    """Compile a set of shell-style wildcards into a single case-sensitive pattern."""
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in sorted(patterns)))
+
+
+def compile_regex(name: str, patterns: frozenset[str]) -> re.Pattern[str]:
+    """Compile a set of regular expressions into a single pattern."""
+    try:
+        return re.compile("|".join(f"(?:{pattern})" for pattern in sorted(patterns)))
+    except re.error as e:
+        raise ConfigError(f"Option '{name}' contains an invalid regular expression", str(e)) from e
+
+
+def get_shard(vmid: str, count: int) -> int:
+    """
+    Return the shard of a guest using rendezvous hashing.
+
+    Every shard gets a score from the hash of the shard index and the vmid and the guest is
+    assigned to the shard with the highest score. If the shard count changes, only the guests
+    that get the highest score from a new shard (or lost their shard) are moved.
+    """
+    return max(
+        range(count),
+        key=lambda index: hashlib.blake2b(f"{index}:{vmid}".encode(), digest_size=8).digest(),
+    )
+
+
+class GuestFilter:
+    """
+    Filter for guest listings compiled from the config.
+
+    The config lists are converted to frozensets and patterns once and only predicates of
+    options that are set become part of the chain. Every predicate returns `True` if the guest
+    should be kept; the reason of the first predicate that fails is reported as exclusion
+    reason. Guests of other shards are excluded last, after all config filters.
+
+    Node predicates only apply to listings with a `node` field like cluster resources, pool
+    predicates expect the `pool` field to be set for all pool members.
+    """
+
+    def __init__(self, config: dict[str, Any]) -> None:
+        self.log = SingleLog()
+        self.logger = self.log.logger
+        self.options = self.get_options(config)
+
+        values = {option: frozenset(map(str, config[option])) for option in FILTER_OPTIONS}
+        self.include_nodes = values["include_nodes"]
+        self.exclude_nodes = values["exclude_nodes"]
+        self.include_pools = values["include_pools"]
+        self.exclude_pools = values["exclude_pools"]
+        self.exclude_tags = values["exclude_tags"]
+
+        self.predicates = tuple(
+            (option, predicate)
+            for option in (
+                "include_vmid",
+                "include_nodes",
+                "include_pools",
+                "include_names",
+                "include_tags",
+                "include_tags_regex",
+                "template",
+                "exclude_state",
+                "exclude_vmid",
+                "exclude_nodes",
+                "exclude_pools",
+                "exclude_names",
+                "exclude_tags",
+                "exclude_tags_regex",
+            )
+            if (predicate := self._get_predicate(option, values.get(option, frozenset())))
+            is not None
+        )
+
+        shard_count = config["shard"]["count"]
+        shard_index = config["shard"]["index"]
+        if shard_count > 1:
+            self.predicates += (
+                (
+                    "shard",
+                    lambda item, _tags: (
+                        get_shard(str(item.get("vmid")), shard_count) == shard_index
+                    ),
+                ),
+            )
+
+    def _get_predicate(self, option: str, values: frozenset[str]) -> Predicate | None:
+        if option == "template":
+            return lambda item, _tags: item.get("template") != 1
+
+        if not values:
+            return None
+
+        include = option.startswith("include_")
+        field = option.partition("_")[2]
+
+        if field == "vmid":
+            return lambda item, _tags: (str(item.get("vmid")) in values) is include
+        if field == "state":
+            return lambda item, _tags: (item.get("status") in values) is include
+        if field == "tags":
+            return lambda _item, tags: tags.isdisjoint(values) is not include
+        if field == "nodes":
+            # Node listings have no node field, the nodes are filtered before listing them
+            return lambda item, _tags: "node" not in item or (item["node"] in values) is include
+        if field == "pools":
+            return lambda item, _tags: (item.get("pool") in values) is include
+        if field == "names":
+            names = compile_globs(values)
+            return lambda item, _tags: (
+                (names.match(str(item.get("name", ""))) is not None) is include
+            )
+
+        regex = compile_regex(option, values)
+        return lambda _item, tags: any(regex.fullmatch(tag) for tag in tags) is include
+
+    def is_node_included(self, node: str) -> bool:
+        """Check if guests of a node can pass the filter at all."""
+        if self.include_nodes and node not in self.include_nodes:
+            return False
+
+        return node not in self.exclude_nodes
+
+    @staticmethod
+    def get_options(config: dict[str, Any]) -> tuple[tuple[Any, ...], ...]:
+        """Return a snapshot of the filter options to detect config changes."""
+        return (
+            *(tuple(config[option]) for option in FILTER_OPTIONS),
+            (config["shard"]["count"], config["shard"]["index"]),
+        )
+
+    def get_reason(self, item: dict[str, Any], tags: frozenset[str]) -> str | None:
+        """Return the reason why the guest is excluded or `None` if it is kept."""
+        for reason, predicate in self.predicates:
+            if not predicate(item, tags):
+                return reason
+
+        return None
+
+    def apply(
+        self, items: Iterable[dict[str, Any]], excluded: dict[str, int] | None = None
+    ) -> list[dict[str, Any]]:
+        """
+        Return all guests that pass the filter.
+
+        :param items: Guest listing
+        :param excluded: Optional mapping to count excluded guests by reason
+        :returns: List of the kept guests, the items are not copied
+        """
+        debug = self.logger.isEnabledFor(logging.DEBUG)
+        kept: list[dict[str, Any]] = []
+        for item in items:
+            tag_list = get_tags(item)
+            tags = frozenset(tag_list)
+            if debug and tag_list:
+                self.logger.debug(f"vmid {item.get('vmid')}: discovered tags: {tag_list}")
+
+            reason = self.get_reason(item, tags)
+            if reason is None:
+                kept.append(item)
+                continue
+
+            if excluded is not None:
+                excluded[reason] = excluded.get(reason, 0) + 1
+            if debug and reason == "exclude_tags":
+                self.logger.debug(
+                    f"vmid {item.get('vmid')}: "
+                    f"excluded by tags: {list(tags.intersection(self.exclude_tags))}"
+                )
+
+        return kept
@@ -1,11 +1,28 @@
 #!/usr/bin/env python3
 """Prometheus SD object models."""
 
+import sys
+from collections.abc import Iterator
+from functools import cache
 from typing import Any
 
 
+@cache
+def label_name(key: str) -> str:
+    """Return the interned meta label name for a label key."""
+    key = key.replace("-", "_").replace(" ", "_")
+    return sys.intern(f"__meta_pve_{key}")
+
+
 class Host:
-    """Represents a virtual machine or container in PVE."""
+    """
+    Represents a virtual machine or container in PVE.
+
+    Additional labels are stored as a flat tuple of interned label names and values.
+    The label dict is only built on access, e.g. by `to_sd_json`.
+    """
+
+    __slots__ = ("_labels", "hostname", "ipv4_address", "ipv6_address", "node", "pve_type", "vmid")
 
     def __init__(
         self,
@@ -14,62 +31,128 @@ class Host:
         ipv4_address: str | None,
         ipv6_address: str | None,
         pve_type: str,
+        node: str | None = None,
     ) -> None:
         self.hostname = str(hostname)
         self.ipv4_address = str(ipv4_address) if ipv4_address else None
         self.ipv6_address = str(ipv6_address) if ipv6_address else None
         self.vmid = str(vmid)
-        self.pve_type = str(pve_type)
-        self.labels: dict[str, str] = {}
-        self.add_label("ipv4", ipv4_address)
-        self.add_label("ipv6", ipv6_address)
-        self.add_label("name", hostname)
-        self.add_label("type", pve_type)
-        self.add_label("vmid", vmid)
+        self.pve_type = sys.intern(str(pve_type))
+        self.node = sys.intern(str(node)) if node else None
+        self._labels: tuple[str, ...] = ()
 
     def __str__(self) -> str:
         ipv4 = self.ipv4_address if self.ipv4_address is not None else "False"
         ipv6 = self.ipv6_address if self.ipv6_address is not None else "False"
         return f"{self.hostname}({self.vmid}): {self.pve_type} {ipv4} {ipv6}"
 
+    @property
+    def labels(self) -> dict[str, str]:
+        labels = {
+            label_name("ipv4"): self.ipv4_address if self.ipv4_address is not None else "False",
+            label_name("ipv6"): self.ipv6_address if self.ipv6_address is not None else "False",
+            label_name("name"): self.hostname,
+            label_name("type"): self.pve_type,
+            label_name("vmid"): self.vmid,
+        }
+        items = iter(self._labels)
+        labels.update(zip(items, items, strict=True))
+
+        return labels
+
     def add_label(self, key: str, value: Any) -> None:
-        key = key.replace("-", "_").replace(" ", "_")
-        self.labels[f"__meta_pve_{key}"] = str(value) if value is not None else "False"
+        name = label_name(key)
+        value = str(value) if value is not None else "False"
+
+        names = self._labels[::2]
+        if name in names:
+            index = names.index(name) * 2 + 1
+            self._labels = (*self._labels[:index], value, *self._labels[index + 1 :])
+        else:
+            self._labels = (*self._labels, name, value)
+
+    def get_label(self, key: str) -> str | None:
+        """Return the value of an additional label without building the label dict."""
+        names = self._labels[::2]
+        name = label_name(key)
+        if name not in names:
+            return None
+
+        return self._labels[names.index(name) * 2 + 1]
+
+    def copy(self) -> "Host":
+        """Return a copy of the host that can be labeled independently."""
+        host = Host(
+            self.vmid,
+            self.hostname,
+            self.ipv4_address,
+            self.ipv6_address,
+            self.pve_type,
+            self.node,
+        )
+        host._labels = self._labels
+
+        return host
 
     def to_sd_json(self) -> dict[str, Any]:
         return {"targets": [self.hostname], "labels": self.labels}
 
 
 class HostList:
-    """Collection of host objects."""
+    """Collection of host objects indexed by type and id."""
 
     def __init__(self) -> None:
-        self.hosts: list[Host] = []
+        self._hosts: dict[tuple[str, str], Host] = {}
 
     def __eq__(self, other: object) -> bool:
         if not isinstance(other, HostList):
             return False
 
-        if len(other.hosts) != len(self.hosts):
-            return False
+        return self._hosts.keys() == other._hosts.keys()
 
-        for host in self.hosts:
-            if other.host_exists(host):
-                continue
-            return False
+    def __len__(self) -> int:
+        return len(self._hosts)
+
+    def __iter__(self) -> Iterator[Host]:
+        return iter(self._hosts.values())
 
-        return True
+    @property
+    def hosts(self) -> list[Host]:
+        return list(self._hosts.values())
+
+    @staticmethod
+    def _get_key(host: Host) -> tuple[str, str]:
+        return (host.pve_type, host.vmid)
 
     def clear(self) -> None:
-        self.hosts = []
+        self._hosts = {}
 
     def add_host(self, host: Host) -> None:
-        if not self.host_exists(host):
-            self.hosts.append(host)
+        self._hosts.setdefault(self._get_key(host), host)
+
+    def remove_host(self, host: Host) -> None:
+        self._hosts.pop(self._get_key(host), None)
+
+    def get_host(self, pve_type: str, vmid: str) -> Host | None:
+        return self._hosts.get((str(pve_type), str(vmid)))
 
     def host_exists(self, host: Host) -> bool:
         """Check if a host is already in the list by id and type."""
-        for current in self.hosts:
-            if current.pve_type == host.pve_type and current.vmid == host.vmid:
-                return True
-        return False
+        return self._get_key(host) in self._hosts
+
+    def diff(self, other: "HostList") -> tuple[list[Host], list[Host], list[Host]]:
+        """
+        Compare the host list with another one.
+
+        :param other: Host list to compare with, e.g. the result of a newer discovery
+        :returns: Tuple of hosts added in, removed from and changed in the other list
+        """
+        added = [host for key, host in other._hosts.items() if key not in self._hosts]
+        removed = [host for key, host in self._hosts.items() if key not in other._hosts]
+        changed = [
+            host
+            for key, host in other._hosts.items()
+            if key in self._hosts and self._hosts[key].to_sd_json() != host.to_sd_json()
+        ]
+
+        return added, removed, changed
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Parser for PVE network config strings."""
+
+from typing import NamedTuple
+
+# QEMU network device models, used as key for the MAC address e.g. `virtio=BC:24:11:00:00:01`
+NET_MODELS = frozenset(
+    (
+        "e1000",
+        "e1000-82540em",
+        "e1000-82544gc",
+        "e1000-82545em",
+        "e1000e",
+        "i82551",
+        "i82557b",
+        "i82559er",
+        "ne2k_isa",
+        "ne2k_pci",
+        "pcnet",
+        "rtl8139",
+        "virtio",
+        "vmxnet3",
+    )
+)
+MAC_KEYS = frozenset(("hwaddr", "macaddr"))
+IPV6_CHARS = "0123456789abcdefABCDEF:."
+
+
+class NetConfig(NamedTuple):
+    """Addresses and interface properties of a `netX` or `ipconfigX` config string."""
+
+    ip: str | None = None
+    gw: str | None = None
+    ip6: str | None = None
+    bridge: str | None = None
+    mac: str | None = None
+
+
+def _is_ipv4(value: str) -> bool:
+    return value.count(".") == 3 and value.replace(".", "").isdigit()
+
+
+def _is_ipv6(value: str) -> bool:
+    return ":" in value and not value.strip(IPV6_CHARS)
+
+
+def parse_net_config(value: str) -> NetConfig:
+    """
+    Parse a PVE network config string.
+
+    Supports QEMU and LXC network devices (`net0`) as well as cloud-init configs
+    (`ipconfig0`). Options are split once, so the runtime is linear in the string length.
+    The prefix length of CIDR addresses is stripped and values without a static address
+    like `dhcp` or `auto` are ignored. IPv6 addresses set with the `ip` option are returned
+    as `ip6`.
+
+    :param value: Config string, e.g. `name=eth0,bridge=vmbr0,ip=192.0.2.10/24,gw=192.0.2.1`
+    :returns: Parsed network config
+    """
+    ip: str | None = None
+    gw: str | None = None
+    ip6: str | None = None
+    bridge: str | None = None
+    mac: str | None = None
+
+    for option in value.split(","):
+        key, _, item = option.partition("=")
+        if key == "ip" or key == "ip6":
+            address = item.partition("/")[0]
+            if not ip and key == "ip" and _is_ipv4(address):
+                ip = address
+            elif not ip6 and _is_ipv6(address):
+                ip6 = address
+        elif key == "gw":
+            gw = gw or item
+        elif key == "bridge":
+            bridge = item
+        elif key in MAC_KEYS or key in NET_MODELS:
+            mac = mac or item or None
+
+    return NetConfig(ip, gw, ip6, bridge, mac)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""Output writers for discovered targets."""
+
+import hashlib
+import json
+import os
+import shutil
+import string
+import tempfile
+from abc import ABC, abstractmethod
+from collections.abc import Iterable, Iterator
+from os import chmod
+
+from prometheus_client import Counter
+
+from prometheuspvesd.exception import ConfigError
+from prometheuspvesd.logger import SingleLog
+from prometheuspvesd.model import Host, HostList
+
+OUTPUT_WRITE_TOTAL = Counter(
+    "pve_sd_output_writes_total", "Total count of output file updates", ["result"]
+)
+
+# Placeholders supported in output file paths
+PATH_FIELDS = ("node", "type")
+
+
+def get_path_fields(path: str) -> set[str]:
+    """
+    Return the placeholders of an output file path.
+
+    :raises ConfigError: If the path contains unsupported placeholders or unbalanced braces
+    """
+    try:
+        fields = {field for _, field, _, _ in string.Formatter().parse(path) if field is not None}
+    except ValueError as e:
+        raise ConfigError(f"Invalid output file path '{path}'", str(e)) from e
+
+    unknown = fields - set(PATH_FIELDS)
+    if unknown:
+        raise ConfigError(
+            f"Invalid output file path '{path}', unsupported placeholders: "
+            f"{', '.join(sorted(unknown))}",
+            f"Supported placeholders: {', '.join(PATH_FIELDS)}",
+        )
+
+    return fields
+
+
+class OutputWriter(ABC):
+    """Stage of the discovery loop that publishes the host list of a pass."""
+
+    @abstractmethod
+    def write(self, host_list: HostList) -> None:
+        """Publish the host list, called once after every successful discovery pass."""
+
+
+class FileWriter(OutputWriter):
+    """
+    Write targets to Prometheus `file_sd` JSON files.
+
+    The path may contain `{type}` and `{node}` placeholders to split the targets into one
+    file per guest type or node, other placeholders raise a `ConfigError`. Each file is only
+    replaced if its content changed, and files written in a previous pass that no longer have
+    any targets are emptied.
+
+    Targets are serialized one by one, so the document is never held in memory as a whole.
+    They are hashed first and only serialized again into a temp file if the digest changed,
+    unchanged targets cause no disk I/O. The output is compact unless `indent` is set.
+    """
+
+    def __init__(self, path: str, mode: str = "0640", indent: int | None = None) -> None:
+        self.log = SingleLog()
+        self.logger = self.log.logger
+        self.path = path
+        self.mode = int(mode, 8)
+        self.indent = indent or None
+        self.digests: dict[str, str] = {}
+        self.is_template = bool(get_path_fields(path))
+        if self.indent is None:
+            self.encoder = json.JSONEncoder(separators=(",", ":"))
+            self.delimiters = ("[", ",", "]")
+        else:
+            # Same layout as `json.dumps(targets, indent=indent)`
+            self.encoder = json.JSONEncoder(indent=self.indent)
+            padding = " " * self.indent
+            self.delimiters = (f"[\n{padding}", f",\n{padding}", "\n]")
+
+    def _get_path(self, host: Host) -> str:
+        return self.path.format(node=host.node or "unknown", type=host.pve_type)
+
+    def _group(self, host_list: HostList) -> dict[str, Iterable[Host]]:
+        if not self.is_template:
+            return {self.path: host_list}
+
+        groups: dict[str, list[Host]] = {path: [] for path in self.digests}
+        for host in host_list:
+            groups.setdefault(self._get_path(host), []).append(host)
+
+        return dict(groups)
+
+    def _iter_chunks(self, hosts: Iterable[Host]) -> Iterator[str]:
+        start, separator, end = self.delimiters
+        padding = "\n" + " " * self.indent if self.indent is not None else None
+
+        delimiter = start
+        for host in hosts:
+            chunk = self.encoder.encode(host.to_sd_json())
+            if padding is not None:
+                chunk = chunk.replace("\n", padding)
+            yield delimiter + chunk
+            delimiter = separator
+
+        yield "[]" if delimiter == start else end
+
+    def write(self, host_list: HostList) -> None:
+        for path, hosts in self._group(host_list).items():
+            self._write_file(path, hosts)
+
+    def _get_digest(self, hosts: Iterable[Host]) -> str:
+        sha256 = hashlib.sha256()
+        for chunk in self._iter_chunks(hosts):
+            sha256.update(chunk.encode("utf-8"))
+
+        return sha256.hexdigest()
+
+    def _write_file(self, path: str, hosts: Iterable[Host]) -> None:
+        # Skip unchanged targets to avoid unnecessary file_sd reloads in Prometheus
+        digest = self._get_digest(hosts)
+        if digest == self.digests.get(path) and os.path.exists(path):
+            self.logger.debug(f"Targets unchanged, skip writing output file {path}")
+            OUTPUT_WRITE_TOTAL.labels("skipped").inc()
+            return
+
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+
+        # Write to tmp file and move after write
+        with tempfile.NamedTemporaryFile(mode="w", prefix="prometheus-pve-sd", delete=False) as tf:
+            tf.writelines(self._iter_chunks(hosts))
+
+        shutil.move(tf.name, path)
+        chmod(path, self.mode)
+        self.digests[path] = digest
+        OUTPUT_WRITE_TOTAL.labels("written").inc()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Scheduler for discovery loops."""
+
+import random
+from time import monotonic
+
+from prometheus_client import Counter, Gauge
+
+SCHEDULE_LAG = Gauge(
+    "pve_sd_schedule_lag_seconds", "Seconds the last discovery loop started after its schedule"
+)
+SCHEDULE_MISSED_TOTAL = Counter(
+    "pve_sd_schedule_missed_total",
+    "Number of loop intervals skipped because a discovery loop took longer than the interval",
+)
+SCHEDULE_INTERVAL = Gauge(
+    "pve_sd_schedule_interval_seconds", "Current start-to-start interval of discovery loops"
+)
+
+
+class Scheduler:
+    """
+    Schedule discovery loops at a fixed start-to-start interval.
+
+    Each start is delayed by a random jitter of up to `jitter` seconds, so instances that were
+    started together drift apart. If a loop takes longer than the current interval, the
+    interval is doubled up to `max_interval`; it is halved again once loops finish within
+    half of the interval.
+    """
+
+    def __init__(self, interval: float, jitter: float = 0, max_interval: float = 0) -> None:
+        self.interval = interval
+        self.jitter = jitter
+        self.max_interval = max(interval, max_interval)
+        self.current = interval
+        self.started: float | None = None
+        self.next_start: float | None = None
+        SCHEDULE_INTERVAL.set(self.current)
+
+    def get_jitter(self) -> float:
+        return random.uniform(0, self.jitter) if self.jitter > 0 else 0.0  # noqa: S311
+
+    def start(self) -> None:
+        """Mark the start of a discovery loop."""
+        self.started = monotonic()
+        if self.next_start is not None:
+            SCHEDULE_LAG.set(max(0.0, self.started - self.next_start))
+
+    def finish(self) -> float:
+        """
+        Mark the end of a discovery loop.
+
+        :returns: Seconds to wait until the next loop should start
+        """
+        now = monotonic()
+        started = self.started if self.started is not None else now
+        duration = now - started
+
+        if duration >= self.current:
+            SCHEDULE_MISSED_TOTAL.inc(int(duration // self.current))
+            self.current = min(self.max_interval, self.current * 2)
+        elif self.current > self.interval and duration * 2 < self.current:
+            self.current = max(self.interval, self.current / 2)
+
+        SCHEDULE_INTERVAL.set(self.current)
+        self.next_start = started + self.current + self.get_jitter()
+
+        return max(0.0, self.next_start - now)
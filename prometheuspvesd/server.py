@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Prometheus HTTP SD endpoint."""
+
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+
+from prometheuspvesd.logger import SingleLog
+from prometheuspvesd.model import HostList
+from prometheuspvesd.output import OutputWriter
+
+
+class HTTPSDServer(OutputWriter):
+    """
+    Serve discovered targets in the Prometheus HTTP SD format.
+
+    The response document is serialized once per discovery pass and served from memory.
+    Clients sending a matching `If-None-Match` header get an empty `304 Not Modified`.
+    """
+
+    def __init__(self, address: str, port: int, path: str) -> None:
+        self.log = SingleLog()
+        self.logger = self.log.logger
+        self.path = path
+        self.document: tuple[bytes, str] | None = None
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((address, port), self._get_handler())
+        self.server.daemon_threads = True
+
+    def _get_handler(self) -> type[BaseHTTPRequestHandler]:
+        sd_server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?", 1)[0] != sd_server.path:
+                    self.send_error(404)
+                    return
+
+                with sd_server._lock:
+                    document = sd_server.document
+
+                if document is None:
+                    self.send_error(503, "Discovery has not finished yet")
+                    return
+
+                body, etag = document
+                if etag in self.headers.get("If-None-Match", ""):
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+                sd_server.logger.debug(f"HTTP SD request: {format % args}")
+
+        return Handler
+
+    def start(self) -> None:
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+
+    def update(self, host_list: HostList) -> None:
+        """Serialize the host list and replace the served document."""
+        body = json.dumps(
+            [host.to_sd_json() for host in host_list.hosts], separators=(",", ":")
+        ).encode("utf-8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+        with self._lock:
+            self.document = (body, etag)
+
+    def write(self, host_list: HostList) -> None:
+        self.update(host_list)
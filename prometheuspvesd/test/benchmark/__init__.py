@@ -0,0 +1 @@
+"""Benchmarks, run as module e.g. `python -m prometheuspvesd.test.benchmark.model`."""
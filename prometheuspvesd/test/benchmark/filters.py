@@ -0,0 +1,87 @@
+"""Benchmark for the compiled guest filter against the previous per-item filter."""
+
+import sys
+import timeit
+from collections import defaultdict
+from typing import Any
+
+from prometheuspvesd.filters import FILTER_OPTIONS, GuestFilter
+
+GUESTS = 50_000
+ROUNDS = 5
+
+# Options not used by the previous filter are left empty
+CONFIG: dict[str, Any] = {
+    **{option: [] for option in FILTER_OPTIONS},
+    "exclude_vmid": [str(vmid) for vmid in range(100, 2100)],
+    "exclude_tags": ["unmonitored", "excluded"],
+    "exclude_state": ["prelaunch", "stopped"],
+    "shard": {"count": 1, "index": 0},
+}
+
+
+def build(count: int) -> list[dict[str, Any]]:
+    tags = ["monitored;postgres", "unmonitored", "web;frontend", None]
+    states = ["running", "running", "stopped", "prelaunch"]
+
+    return [
+        {
+            "vmid": str(100 + i),
+            "name": f"{100 + i}.example.com",
+            "status": states[i % len(states)],
+            "template": 1 if i % 50 == 0 else "",
+            "tags": tags[i % len(tags)],
+        }
+        for i in range(count)
+    ]
+
+
+def legacy_filter(config: dict[str, Any], pve_list: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    filtered: list[dict[str, Any]] = []
+    for item in pve_list:
+        obj = defaultdict(dict, item)
+        tags: list[str] = []
+        tags_excl = config["exclude_tags"]
+
+        if isinstance(obj["tags"], str):
+            tags = obj["tags"].split(";")
+
+        if len(config["include_vmid"]) > 0 and str(obj["vmid"]) not in config["include_vmid"]:
+            continue
+
+        if len(config["include_tags"]) > 0 and (
+            bool(obj["tags"]) is False or set(tags).isdisjoint(config["include_tags"])
+        ):
+            continue
+
+        if obj["template"] == 1:
+            continue
+
+        if obj["status"] in map(str, config["exclude_state"]):
+            continue
+
+        if str(obj["vmid"]) in config["exclude_vmid"]:
+            continue
+
+        if isinstance(obj["tags"], str) and not set(tags).isdisjoint(tags_excl):
+            continue
+
+        filtered.append(item.copy())
+    return filtered
+
+
+def main() -> None:
+    guests = build(GUESTS)
+    guest_filter = GuestFilter(CONFIG)
+
+    legacy = timeit.timeit(lambda: legacy_filter(CONFIG, guests), number=ROUNDS) / ROUNDS
+    compiled = timeit.timeit(lambda: guest_filter.apply(guests), number=ROUNDS) / ROUNDS
+
+    sys.stdout.write(f"guests:   {GUESTS}\n")
+    sys.stdout.write(f"kept:     {len(guest_filter.apply(guests))}\n")
+    sys.stdout.write(f"legacy:   {legacy * 1000:.1f} ms\n")
+    sys.stdout.write(f"compiled: {compiled * 1000:.1f} ms\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Memory benchmark for the host model."""
+
+import gc
+import sys
+import tracemalloc
+
+from prometheuspvesd.model import Host, HostList
+
+HOSTS = 10_000
+
+
+def build(count: int) -> HostList:
+    host_list = HostList()
+    for i in range(count):
+        vmid = str(100 + i)
+        host = Host(vmid, f"{vmid}.example.com", f"192.0.{i // 256 % 256}.{i % 256}", None, "qemu")
+        host.add_label("cpu", 1)
+        host.add_label("cores", 2)
+        host.add_label("memory", 2048)
+        host.add_label("status", "running")
+        host.add_label("tags", "monitored;postgres")
+        host_list.add_host(host)
+
+    return host_list
+
+
+def main() -> None:
+    gc.collect()
+    tracemalloc.start()
+    host_list = build(HOSTS)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    sys.stdout.write(f"hosts:          {len(host_list.hosts)}\n")
+    sys.stdout.write(f"bytes per host: {current / HOSTS:.0f}\n")
+    sys.stdout.write(f"peak bytes:     {peak}\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Benchmark for the network config parser against the previous regular expressions."""
+
+import re
+import sys
+import timeit
+from collections.abc import Callable
+
+from prometheuspvesd.netconfig import parse_net_config
+
+ROUNDS = 20_000
+
+CORPUS = [
+    "virtio=BC:24:11:2C:69:EC,bridge=vmbr0,firewall=1",
+    "virtio=BC:24:11:2C:69:ED,bridge=vmbr0,tag=120,queues=4",
+    "e1000=BC:24:11:08:1B:41,bridge=vmbr1,link_down=1",
+    "model=virtio,macaddr=BC:24:11:2C:69:EE,bridge=vmbr0,mtu=1500",
+    "name=eth0,bridge=vmbr0,firewall=1,gw=192.0.2.1,hwaddr=BC:24:11:5E:7A:01,"
+    "ip=192.0.2.10/24,ip6=2001:db8::10/64,type=veth",
+    "name=eth0,bridge=vmbr0,hwaddr=BC:24:11:5E:7A:02,ip=dhcp,ip6=auto,type=veth",
+    "name=eth1,bridge=vmbr2,gw6=2001:db8:1::1,hwaddr=BC:24:11:5E:7A:03,"
+    "ip6=2001:db8:1::30/64,type=veth",
+    "ip=192.0.2.20/24,gw=192.0.2.1",
+    "ip=192.0.2.21/24,gw=192.0.2.1,ip6=2001:db8::21/64,gw6=2001:db8::1",
+    "ip=dhcp,ip6=dhcp",
+    "virtio=D8-85-75-47-2E-8D,bridge=vmbr122,ip=192.0.2.25,ip=2001:db8::666:77:8888",
+]
+
+# Long hex runs without a colon force the previous IPv6 expression to backtrack through all
+# ways of splitting the run into groups
+PATHOLOGICAL = "ip=" + "abcd" * 7 + "g"
+
+IPV4_RE = r"ip=(\d*\.\d*\.\d*\.\d*)"
+IPV6_RE = r"ip=(([a-fA-F0-9]{0,4}:{0,2}){0,7}:[0-9a-fA-F]{1,4})"
+
+
+def parse_regex(value: str) -> tuple[str | None, str | None]:
+    ipv4 = re.search(IPV4_RE, value)
+    ipv6 = re.search(IPV6_RE, value)
+
+    return (ipv4.group(1) if ipv4 else None, ipv6.group(1) if ipv6 else None)
+
+
+def parse(value: str) -> tuple[str | None, str | None]:
+    net_config = parse_net_config(value)
+
+    return net_config.ip, net_config.ip6
+
+
+def run(
+    func: Callable[[str], tuple[str | None, str | None]], corpus: list[str], rounds: int
+) -> float:
+    elapsed = timeit.timeit(lambda: [func(value) for value in corpus], number=rounds)
+
+    return elapsed / (rounds * len(corpus)) * 1e6
+
+
+def main() -> None:
+    for name, corpus, rounds in (
+        ("corpus", CORPUS, ROUNDS),
+        ("pathological", [PATHOLOGICAL], ROUNDS // 100),
+    ):
+        regex = run(parse_regex, corpus, rounds)
+        parser = run(parse, corpus, rounds)
+        sys.stdout.write(f"{name}:\n")
+        sys.stdout.write(f"  regex:  {regex:.2f} us per string\n")
+        sys.stdout.write(f"  parser: {parser:.2f} us per string\n")
+
+
+if __name__ == "__main__":
+    main()
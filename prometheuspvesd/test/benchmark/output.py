@@ -0,0 +1,72 @@
+"""Peak memory and write time of the streaming file writer against the previous `json.dumps`."""
+
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+
+from prometheuspvesd.model import HostList
+from prometheuspvesd.output import FileWriter
+from prometheuspvesd.test.benchmark.model import build
+
+HOSTS = 20_000
+
+
+def legacy_write(host_list: HostList, path: str) -> None:
+    output: list[dict[str, str]] = []
+    for host in host_list.hosts:
+        output.append(host.to_sd_json())
+
+    content = json.dumps(output, indent=4)
+    with open(path, "w") as stream:
+        stream.write(content)
+
+
+def streaming_write(host_list: HostList, path: str) -> None:
+    FileWriter(path).write(host_list)
+
+
+def measure(
+    name: str,
+    write: Callable[[HostList, str], None],
+    path: str,
+    queue: "multiprocessing.Queue[str]",
+) -> None:
+    host_list = build(HOSTS)
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    write(host_list, path)
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is reported in KiB on Linux
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline
+    size = os.path.getsize(path)
+    queue.put(
+        f"{name:10} {elapsed * 1000:8.1f} ms {peak / 1024:8.1f} MiB {size / 1024:8.0f} KiB\n"
+    )
+
+
+def main() -> None:
+    # Every writer runs in a fresh process, the RSS high-water mark can not be reset
+    context = multiprocessing.get_context("fork")
+    queue: multiprocessing.Queue[str] = context.Queue()
+
+    sys.stdout.write(f"hosts: {HOSTS}\n")
+    sys.stdout.write(f"{'writer':10} {'time':>11} {'peak rss':>12} {'size':>12}\n")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, write in (("legacy", legacy_write), ("streaming", streaming_write)):
+            process = context.Process(
+                target=measure, args=(name, write, os.path.join(tmp, f"{name}.json"), queue)
+            )
+            process.start()
+            sys.stdout.write(queue.get())
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
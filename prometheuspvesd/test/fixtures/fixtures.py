@@ -22,6 +22,27 @@ def builtins() -> dict[str, Any]:
             "type": environs.Env().str,
         },
         "metrics.port": {"default": 8000, "env": "METRICS_PORT", "type": environs.Env().int},
+        "metrics.node_labels": {
+            "default": False,
+            "env": "METRICS_NODE_LABELS",
+            "type": environs.Env().bool,
+        },
+        "http_sd.enabled": {
+            "default": False,
+            "env": "HTTP_SD_ENABLED",
+            "type": environs.Env().bool,
+        },
+        "http_sd.address": {
+            "default": "127.0.0.1",
+            "env": "HTTP_SD_ADDRESS",
+            "type": environs.Env().str,
+        },
+        "http_sd.port": {"default": 8001, "env": "HTTP_SD_PORT", "type": environs.Env().int},
+        "http_sd.path": {
+            "default": "/targets",
+            "env": "HTTP_SD_PATH",
+            "type": environs.Env().str,
+        },
         "config_file": {"default": "", "env": "CONFIG_FILE", "type": environs.Env().str},
         "logging.level": {
             "default": "WARNING",
@@ -47,13 +68,102 @@ def builtins() -> dict[str, Any]:
             "file": True,
             "type": environs.Env().str,
         },
+        "output_file_indent": {
+            "default": 0,
+            "env": "OUTPUT_FILE_INDENT",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "outputs": {
+            "default": [],
+            "file": True,
+            "schema": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "file": {"type": "string"},
+                        "mode": {"type": "string"},
+                        "indent": {"type": ["integer", "null"]},
+                    },
+                    "required": ["file"],
+                    "additionalProperties": False,
+                },
+            },
+        },
         "loop_delay": {
             "default": 300,
             "env": "LOOP_DELAY",
             "file": True,
             "type": environs.Env().int,
         },
+        "loop_jitter": {
+            "default": 0,
+            "env": "LOOP_JITTER",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "loop_max_delay": {
+            "default": 3600,
+            "env": "LOOP_MAX_DELAY",
+            "file": True,
+            "type": environs.Env().int,
+        },
         "service": {"default": False, "env": "SERVICE", "file": True, "type": environs.Env().bool},
+        "discovery.stale_max_age": {
+            "default": 3600,
+            "env": "DISCOVERY_STALE_MAX_AGE",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "discovery.workers": {
+            "default": 4,
+            "env": "DISCOVERY_WORKERS",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "discovery.inventory": {
+            "default": "cluster",
+            "env": "DISCOVERY_INVENTORY",
+            "file": True,
+            "type": environs.Env().str,
+        },
+        "discovery.agent_cache_ttl": {
+            "default": 0,
+            "env": "DISCOVERY_AGENT_CACHE_TTL",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "discovery.backend": {
+            "default": "sync",
+            "env": "DISCOVERY_BACKEND",
+            "file": True,
+            "type": environs.Env().str,
+        },
+        "discovery.incremental": {
+            "default": False,
+            "env": "DISCOVERY_INCREMENTAL",
+            "file": True,
+            "type": environs.Env().bool,
+        },
+        "discovery.resync_interval": {
+            "default": 3600,
+            "env": "DISCOVERY_RESYNC_INTERVAL",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "events.enabled": {
+            "default": False,
+            "env": "EVENTS_ENABLED",
+            "file": True,
+            "type": environs.Env().bool,
+        },
+        "events.poll_interval": {
+            "default": 10,
+            "env": "EVENTS_POLL_INTERVAL",
+            "file": True,
+            "type": environs.Env().int,
+        },
         "exclude_state": {
             "default": [],
             "env": "EXCLUDE_STATE",
@@ -84,6 +194,66 @@ def builtins() -> dict[str, Any]:
             "file": True,
             "type": environs.Env().list,
         },
+        "exclude_nodes": {
+            "default": [],
+            "env": "EXCLUDE_NODES",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "include_nodes": {
+            "default": [],
+            "env": "INCLUDE_NODES",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "exclude_pools": {
+            "default": [],
+            "env": "EXCLUDE_POOLS",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "include_pools": {
+            "default": [],
+            "env": "INCLUDE_POOLS",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "exclude_names": {
+            "default": [],
+            "env": "EXCLUDE_NAMES",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "include_names": {
+            "default": [],
+            "env": "INCLUDE_NAMES",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "exclude_tags_regex": {
+            "default": [],
+            "env": "EXCLUDE_TAGS_REGEX",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "include_tags_regex": {
+            "default": [],
+            "env": "INCLUDE_TAGS_REGEX",
+            "file": True,
+            "type": environs.Env().list,
+        },
+        "shard.count": {
+            "default": 1,
+            "env": "SHARD_COUNT",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "shard.index": {
+            "default": 0,
+            "env": "SHARD_INDEX",
+            "file": True,
+            "type": environs.Env().int,
+        },
         "pve.server": {
             "default": "dummy_server",
             "env": "PVE_SERVER",
@@ -120,6 +290,48 @@ def builtins() -> dict[str, Any]:
             "file": True,
             "type": environs.Env().int,
         },
+        "pve.pool_size": {
+            "default": 10,
+            "env": "PVE_POOL_SIZE",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "pve.pool_block": {
+            "default": False,
+            "env": "PVE_POOL_BLOCK",
+            "file": True,
+            "type": environs.Env().bool,
+        },
+        "pve.keep_alive": {
+            "default": True,
+            "env": "PVE_KEEP_ALIVE",
+            "file": True,
+            "type": environs.Env().bool,
+        },
+        "pve.request_timeout": {
+            "default": 10,
+            "env": "PVE_REQUEST_TIMEOUT",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "pve.retries": {
+            "default": 3,
+            "env": "PVE_RETRIES",
+            "file": True,
+            "type": environs.Env().int,
+        },
+        "pve.retry_backoff": {
+            "default": 0.5,
+            "env": "PVE_RETRY_BACKOFF",
+            "file": True,
+            "type": environs.Env().float,
+        },
+        "pve.retry_budget": {
+            "default": 50,
+            "env": "PVE_RETRY_BUDGET",
+            "file": True,
+            "type": environs.Env().int,
+        },
         "pve.verify_ssl": {
             "default": True,
             "env": "PVE_VERIFY_SSL",
@@ -132,19 +344,54 @@ def builtins() -> dict[str, Any]:
 @pytest.fixture
 def defaults() -> dict[str, Any]:
     return {
+        "discovery": {
+            "agent_cache_ttl": 0,
+            "backend": "sync",
+            "incremental": False,
+            "inventory": "cluster",
+            "resync_interval": 3600,
+            "stale_max_age": 3600,
+            "workers": 4,
+        },
+        "events": {"enabled": False, "poll_interval": 10},
+        "exclude_names": [],
+        "exclude_nodes": [],
+        "exclude_pools": [],
         "exclude_state": [],
         "exclude_tags": [],
+        "exclude_tags_regex": [],
         "exclude_vmid": [],
+        "http_sd": {"address": "127.0.0.1", "enabled": False, "path": "/targets", "port": 8001},
+        "include_names": [],
+        "include_nodes": [],
+        "include_pools": [],
         "include_tags": [],
+        "include_tags_regex": [],
         "include_vmid": [],
         "logging": {"format": "console", "level": "WARNING"},
         "loop_delay": 300,
-        "metrics": {"address": "127.0.0.1", "enabled": True, "port": 8000},
+        "loop_jitter": 0,
+        "loop_max_delay": 3600,
+        "metrics": {
+            "address": "127.0.0.1",
+            "enabled": True,
+            "node_labels": False,
+            "port": 8000,
+        },
         "output_file": "dummy",
+        "output_file_indent": 0,
         "output_file_mode": "0640",
+        "outputs": [],
         "pve": {
             "auth_timeout": 5,
+            "keep_alive": True,
             "password": "",
+            "pool_block": False,
+            "pool_size": 10,
+            "request_timeout": 10,
+            "retries": 3,
+            "retry_backoff": 0.5,
+            "retry_budget": 50,
             "server": "",
             "user": "",
             "token_name": "",
@@ -152,6 +399,7 @@ def defaults() -> dict[str, Any]:
             "verify_ssl": True,
         },
         "service": True,
+        "shard": {"count": 1, "index": 0},
     }
 
 
@@ -237,11 +485,101 @@ def qemus() -> list[dict[str, Any]]:
     ]
 
 
+@pytest.fixture
+def resources() -> list[dict[str, Any]]:
+    # Fields as returned by `/cluster/resources?type=vm`, which differ from node listings
+    return [
+        {
+            "id": "qemu/100",
+            "type": "qemu",
+            "vmid": 100,
+            "name": "100.example.com",
+            "node": "example-node",
+            "status": "running",
+            "template": 0,
+            "uptime": 3101505,
+            "cpu": 0.0202130478509556,
+            "maxcpu": 1,
+            "mem": 496179157,
+            "maxmem": 1073741824,
+            "disk": 0,
+            "maxdisk": 26843545600,
+            "diskread": 0,
+            "diskwrite": 0,
+            "netin": 2856071643,
+            "netout": 12159205236,
+            "tags": "unmonitored;excluded;postgres",
+        },
+        {
+            "id": "qemu/101",
+            "type": "qemu",
+            "vmid": 101,
+            "name": "101.example.com",
+            "node": "example-node",
+            "status": "running",
+            "template": 0,
+            "uptime": 3101505,
+            "cpu": 0.0202130478509556,
+            "maxcpu": 1,
+            "mem": 496179157,
+            "maxmem": 1073741824,
+            "disk": 0,
+            "maxdisk": 26843545600,
+            "diskread": 0,
+            "diskwrite": 0,
+            "netin": 2856071643,
+            "netout": 12159205236,
+        },
+        {
+            "id": "qemu/102",
+            "type": "qemu",
+            "vmid": 102,
+            "name": "102.example.com",
+            "node": "example-node",
+            "status": "prelaunch",
+            "template": 0,
+            "uptime": 3101505,
+            "cpu": 0.0202130478509556,
+            "maxcpu": 1,
+            "mem": 496179157,
+            "maxmem": 1073741824,
+            "disk": 0,
+            "maxdisk": 26843545600,
+            "diskread": 0,
+            "diskwrite": 0,
+            "netin": 2856071643,
+            "netout": 12159205236,
+            "tags": "monitored",
+        },
+        {
+            "id": "lxc/103",
+            "type": "lxc",
+            "vmid": 103,
+            "name": "103.example.com",
+            "node": "example-node",
+            "status": "stopped",
+            "template": 1,
+            "uptime": 0,
+            "cpu": 0,
+            "maxcpu": 1,
+            "mem": 0,
+            "maxmem": 536870912,
+            "disk": 0,
+            "maxdisk": 8589934592,
+            "diskread": 0,
+            "diskwrite": 0,
+            "netin": 0,
+            "netout": 0,
+        },
+    ]
+
+
 @pytest.fixture
 def instance_config() -> dict[str, Any]:
     return {
         "name": "102.example.com",
         "description": '{"groups": "test-group"}',
+        "agent": "1",
         "net0": "virtio=D8-85-75-47-2E-8D,bridge=vmbr122,ip=192.0.2.25,ip=2001:db8::666:77:8888",
         "cpu": 2,
         "cores": 2,
@@ -0,0 +1,205 @@
+"""Test AsyncProxmoxClient class."""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import pytest
+from aiohttp import web
+from prometheus_client import REGISTRY
+from proxmoxer import ResourceException
+from pytest_mock import MockerFixture
+
+from prometheuspvesd.aioclient import AsyncProxmoxClient
+from prometheuspvesd.config import Config
+from prometheuspvesd.exception import APIError
+
+pytest_plugins = [
+    "prometheuspvesd.test.fixtures.fixtures",
+]
+
+
+def get_sample(name: str) -> float:
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+def run_with_api(
+    client: AsyncProxmoxClient,
+    routes: list[web.RouteDef],
+    func: Callable[[AsyncProxmoxClient], Awaitable[Any]],
+) -> Any:
+    async def run() -> Any:
+        app = web.Application()
+        app.add_routes(routes)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+        client.base_url = f"http://127.0.0.1:{port}/api2/json"
+
+        try:
+            await client.connect()
+            return await func(client)
+        finally:
+            await client.close()
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def client(mocker: MockerFixture, builtins: dict[str, Any]) -> AsyncProxmoxClient:
+    builtins["pve.server"]["default"] = "proxmox.example.com"
+    builtins["pve.user"]["default"] = "root@pam"
+    mocker.patch.dict(Config.SETTINGS, builtins)
+
+    return AsyncProxmoxClient()
+
+
+def test_base_url(client: AsyncProxmoxClient) -> None:
+    assert client.base_url == "https://proxmox.example.com:8006/api2/json"
+
+
+def test_request_ticket_auth(client: AsyncProxmoxClient, instance_config: dict[str, Any]) -> None:
+    client.config.config["pve"]["token_name"] = ""
+
+    async def ticket(request: web.Request) -> web.Response:
+        data = await request.post()
+        assert data["username"] == "root@pam"
+        return web.json_response({"data": {"ticket": "PVE:dummy"}})
+
+    async def config(request: web.Request) -> web.Response:
+        assert request.cookies["PVEAuthCookie"] == "PVE:dummy"
+        assert request.match_info["vmid"] == "100"
+        return web.json_response({"data": instance_config})
+
+    routes = [
+        web.post("/api2/json/access/ticket", ticket),
+        web.get("/api2/json/nodes/{node}/qemu/{vmid}/config", config),
+    ]
+
+    result = run_with_api(
+        client, routes, lambda c: c.get_instance_config("example-node", "qemu", "100")
+    )
+
+    assert result == instance_config
+
+
+def test_request_session_reuse(
+    mocker: MockerFixture, client: AsyncProxmoxClient, nodes: list[dict[str, Any]]
+) -> None:
+    client.config.config["pve"]["token_name"] = ""
+    monotonic = mocker.patch("prometheuspvesd.aioclient.monotonic", return_value=1000.0)
+    tickets = 0
+
+    async def ticket(_request: web.Request) -> web.Response:
+        nonlocal tickets
+        tickets += 1
+        return web.json_response({"data": {"ticket": f"PVE:{tickets}"}})
+
+    async def get_nodes(request: web.Request) -> web.Response:
+        assert request.cookies["PVEAuthCookie"] == f"PVE:{tickets}"
+        return web.json_response({"data": nodes})
+
+    async def poll(c: AsyncProxmoxClient) -> Any:
+        session = c.client
+        for _ in range(3):
+            await c.connect()
+            await c.get_nodes()
+        assert tickets == 1
+        assert c.client is session
+
+        # Tickets are renewed within the same session once they are older than an hour
+        monotonic.return_value = 4600.0
+        await c.connect()
+        assert tickets == 2
+        assert c.client is session
+        return await c.get_nodes()
+
+    routes = [
+        web.post("/api2/json/access/ticket", ticket),
+        web.get("/api2/json/nodes", get_nodes),
+    ]
+
+    assert run_with_api(client, routes, poll) == nodes
+    assert client.client is None
+
+
+def test_request_token_auth(client: AsyncProxmoxClient, nodes: list[dict[str, Any]]) -> None:
+    async def get_nodes(request: web.Request) -> web.Response:
+        assert request.headers["Authorization"] == "PVEAPIToken=root@pam!dummy_name=dummy_value"
+        return web.json_response({"data": nodes})
+
+    result = run_with_api(
+        client, [web.get("/api2/json/nodes", get_nodes)], lambda c: c.get_nodes()
+    )
+
+    assert result == nodes
+
+
+def test_request_retry(mocker: MockerFixture, client: AsyncProxmoxClient) -> None:
+    mocker.patch("prometheuspvesd.aioclient.asyncio.sleep")
+    retries = get_sample("pve_sd_requests_retry_total")
+    calls = 0
+
+    async def get_nodes(_request: web.Request) -> web.Response:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            return web.Response(status=503)
+        return web.json_response({"data": []})
+
+    client.config.config["pve"]["token_name"] = "dummy"
+    result = run_with_api(
+        client, [web.get("/api2/json/nodes", get_nodes)], lambda c: c.get_nodes()
+    )
+
+    assert result == []
+    assert calls == 2
+    assert client.retry_budget == 49
+    assert get_sample("pve_sd_requests_retry_total") - retries == 1
+
+
+def test_request_no_retry_client_error(client: AsyncProxmoxClient) -> None:
+    async def get_nodes(_request: web.Request) -> web.Response:
+        return web.Response(status=403)
+
+    with pytest.raises(ResourceException):
+        run_with_api(client, [web.get("/api2/json/nodes", get_nodes)], lambda c: c.get_nodes())
+
+
+def test_request_no_retry_agent(client: AsyncProxmoxClient) -> None:
+    calls = 0
+
+    async def get_agent_info(_request: web.Request) -> web.Response:
+        nonlocal calls
+        calls += 1
+        return web.Response(status=500, text="QEMU guest agent is not running")
+
+    with pytest.raises(ResourceException):
+        run_with_api(
+            client,
+            [web.get("/api2/json/nodes/pve1/qemu/100/agent/info", get_agent_info)],
+            lambda c: c.get_agent_info("pve1", "qemu", "100"),
+        )
+
+    assert calls == 1
+    assert client.retry_budget == 50
+
+
+def test_request_auth_error(client: AsyncProxmoxClient) -> None:
+    client.config.config["pve"]["token_name"] = ""
+
+    async def ticket(_request: web.Request) -> web.Response:
+        return web.Response(status=401)
+
+    with pytest.raises(APIError, match="401"):
+        run_with_api(
+            client, [web.post("/api2/json/access/ticket", ticket)], lambda c: c.get_nodes()
+        )
+
+
+def test_request_without_session(client: AsyncProxmoxClient) -> None:
+    with pytest.raises(APIError, match="Requests require an active session"):
+        asyncio.run(client.get_nodes())
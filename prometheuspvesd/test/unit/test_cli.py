@@ -2,10 +2,12 @@
 
 import json
 import pathlib
+import shutil
 from typing import Any
 
 import pytest
 from _pytest.capture import CaptureFixture
+from prometheus_client import REGISTRY
 from proxmoxer import ProxmoxAPI
 from pytest_mock import MockerFixture
 
@@ -101,6 +103,95 @@ def test_cli_auth_no_error(
         assert psd.config.config["pve"][key.split(".")[1]] == value
 
 
+def test_cli_choice_error(
+    mocker: MockerFixture, builtins: dict[str, Any], capsys: CaptureFixture[str]
+) -> None:
+    builtins["discovery.inventory"]["default"] = "dummy"
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    mocker.patch.object(ProxmoxClient, "_auth", return_value=mocker.create_autospec(ProxmoxAPI))
+    mocker.patch.object(PrometheusSD, "_fetch", return_value=True)
+
+    with pytest.raises(SystemExit) as e:
+        PrometheusSD()
+
+    _, stderr = capsys.readouterr()
+    assert "Option 'discovery.inventory' must be one of: cluster, nodes" in stderr
+    assert e.value.code == 1
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ({"service": True, "loop_delay": 0}, "Option 'loop_delay' must be at least 1"),
+        (
+            {"events.enabled": True, "events.poll_interval": 0},
+            "Option 'events.poll_interval' must be at least 1",
+        ),
+    ],
+)
+def test_cli_loop_delay_error(
+    mocker: MockerFixture,
+    builtins: dict[str, Any],
+    capsys: CaptureFixture[str],
+    test_input: dict[str, Any],
+    expected: str,
+) -> None:
+    for key, value in test_input.items():
+        builtins[key]["default"] = value
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    mocker.patch.object(ProxmoxClient, "_auth", return_value=mocker.create_autospec(ProxmoxAPI))
+    mocker.patch.object(PrometheusSD, "_fetch", return_value=True)
+
+    with pytest.raises(SystemExit) as e:
+        PrometheusSD()
+
+    _, stderr = capsys.readouterr()
+    assert expected in stderr
+    assert e.value.code == 1
+
+
+@pytest.mark.parametrize("count,index", [(0, 0), (2, 2), (2, -1)])
+def test_cli_shard_error(
+    mocker: MockerFixture,
+    builtins: dict[str, Any],
+    capsys: CaptureFixture[str],
+    count: int,
+    index: int,
+) -> None:
+    builtins["shard.count"]["default"] = count
+    builtins["shard.index"]["default"] = index
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    mocker.patch.object(ProxmoxClient, "_auth", return_value=mocker.create_autospec(ProxmoxAPI))
+    mocker.patch.object(PrometheusSD, "_fetch", return_value=True)
+
+    with pytest.raises(SystemExit) as e:
+        PrometheusSD()
+
+    _, stderr = capsys.readouterr()
+    assert "Option 'shard.count' must be at least 1" in stderr
+    assert e.value.code == 1
+
+
+def test_cli_filter_error(
+    mocker: MockerFixture, builtins: dict[str, Any], capsys: CaptureFixture[str]
+) -> None:
+    builtins["include_tags_regex"]["default"] = ["team-("]
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    mocker.patch.object(ProxmoxClient, "_auth", return_value=mocker.create_autospec(ProxmoxAPI))
+    mocker.patch.object(PrometheusSD, "_fetch", return_value=True)
+
+    with pytest.raises(SystemExit) as e:
+        PrometheusSD()
+
+    _, stderr = capsys.readouterr()
+    assert "Option 'include_tags_regex' contains an invalid regular expression" in stderr
+    assert e.value.code == 1
+
+
 def test_cli_config_error(mocker: MockerFixture, capsys: CaptureFixture[str]) -> None:
     mocker.patch(
         "prometheuspvesd.config.SingleConfig.__init__",
@@ -166,3 +257,135 @@ def test_cli_write(
     assert psd.config.config is not None
     assert json.loads(out.read_text()) == labels
     assert oct(out.stat().st_mode & 0o777) == oct(int(psd.config.config["output_file_mode"], 8))
+
+
+def test_cli_write_unchanged(
+    mocker: MockerFixture,
+    tmp_path: pathlib.Path,
+    builtins: dict[str, Any],
+    inventory: HostList,
+) -> None:
+    out = tmp_path / "out.txt"
+
+    builtins["output_file"]["default"] = out.as_posix()
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    mocker.patch.object(ProxmoxClient, "_auth", return_value=mocker.create_autospec(ProxmoxAPI))
+    mocker.patch.object(Discovery, "propagate", return_value=inventory)
+    move = mocker.patch("shutil.move", wraps=shutil.move)
+
+    psd = PrometheusSD()
+    written = REGISTRY.get_sample_value("pve_sd_output_writes_total", {"result": "written"})
+    skipped = REGISTRY.get_sample_value("pve_sd_output_writes_total", {"result": "skipped"})
+    writes = REGISTRY.get_sample_value("pve_sd_phase_seconds_count", {"phase": "write"})
+
+    psd._write(inventory)
+    assert move.call_count == 1
+    assert (
+        REGISTRY.get_sample_value("pve_sd_phase_seconds_count", {"phase": "write"})
+        == (writes or 0) + 1
+    )
+    assert (
+        REGISTRY.get_sample_value("pve_sd_output_writes_total", {"result": "skipped"})
+        == (skipped or 0) + 1
+    )
+
+    inventory.hosts[0].add_label("status", "stopped")
+    psd._write(inventory)
+    assert move.call_count == 2
+    assert (
+        REGISTRY.get_sample_value("pve_sd_output_writes_total", {"result": "written"})
+        == (written or 0) + 1
+    )
+    assert json.loads(out.read_text())[0]["labels"]["__meta_pve_status"] == "stopped"
+
+
+def test_cli_write_outputs(
+    mocker: MockerFixture,
+    tmp_path: pathlib.Path,
+    builtins: dict[str, Any],
+    inventory: HostList,
+    labels: list[dict[str, Any]],
+) -> None:
+    builtins["output_file"]["default"] = (tmp_path / "unused.json").as_posix()
+    builtins["outputs"]["default"] = [
+        {"file": (tmp_path / "pretty.json").as_posix(), "indent": 4},
+        {"file": (tmp_path / "compact.json").as_posix(), "mode": "0600"},
+    ]
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    mocker.patch.object(ProxmoxClient, "_auth", return_value=mocker.create_autospec(ProxmoxAPI))
+    mocker.patch.object(Discovery, "propagate", return_value=inventory)
+
+    PrometheusSD()
+
+    assert not (tmp_path / "unused.json").exists()
+    assert json.loads((tmp_path / "pretty.json").read_text()) == labels
+    assert json.loads((tmp_path / "compact.json").read_text()) == labels
+    assert "\n" in (tmp_path / "pretty.json").read_text()
+    assert "\n" not in (tmp_path / "compact.json").read_text()
+    assert oct((tmp_path / "compact.json").stat().st_mode & 0o777) == oct(0o600)
+
+
+def test_cli_outputs_error(
+    mocker: MockerFixture,
+    tmp_path: pathlib.Path,
+    builtins: dict[str, Any],
+    capsys: CaptureFixture[str],
+) -> None:
+    config_file = tmp_path / "config.yml"
+    config_file.write_text("outputs:\n  - mode: '0600'\n")
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    mocker.patch("prometheuspvesd.config.default_config_file", config_file.as_posix())
+    mocker.patch.object(PrometheusSD, "_fetch", return_value=True)
+
+    with pytest.raises(SystemExit) as e:
+        PrometheusSD()
+
+    _, stderr = capsys.readouterr()
+    assert "'file' is a required property" in stderr
+    assert e.value.code == 1
+
+
+def test_cli_output_path_error(
+    mocker: MockerFixture, builtins: dict[str, Any], capsys: CaptureFixture[str]
+) -> None:
+    builtins["output_file"]["default"] = "/etc/prometheus/{type}-{env}.json"
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    mocker.patch.object(PrometheusSD, "_fetch", return_value=True)
+
+    with pytest.raises(SystemExit) as e:
+        PrometheusSD()
+
+    _, stderr = capsys.readouterr()
+    assert "unsupported placeholders: env" in stderr
+    assert e.value.code == 1
+
+
+def test_cli_watch_events(
+    mocker: MockerFixture, builtins: dict[str, Any], inventory: HostList
+) -> None:
+    builtins["events.poll_interval"]["default"] = 5
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    mocker.patch.object(ProxmoxClient, "_auth", return_value=mocker.create_autospec(ProxmoxAPI))
+    propagate = mocker.patch.object(Discovery, "propagate", return_value=inventory)
+    mocker.patch.object(
+        Discovery,
+        "poll_events",
+        side_effect=[{"100"}, APIError("Dummy API Exception"), set()],
+    )
+    mocker.patch("prometheuspvesd.cli.monotonic", side_effect=[0, 0, 5, 10, 15])
+    sleep = mocker.patch("prometheuspvesd.cli.sleep")
+    write = mocker.patch.object(PrometheusSD, "_write")
+
+    psd = PrometheusSD()
+    propagate.reset_mock()
+    write.reset_mock()
+    psd._watch_events(15)
+
+    assert [call.args for call in sleep.call_args_list] == [(5,), (5,), (5,)]
+    propagate.assert_called_once_with({"100"})
+    write.assert_called_once_with(inventory)
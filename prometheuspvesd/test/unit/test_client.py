@@ -0,0 +1,253 @@
+"""Test ProxmoxClient class."""
+
+from typing import Any
+
+import pytest
+import requests
+from prometheus_client import REGISTRY
+from proxmoxer import ProxmoxAPI, ResourceException
+from pytest_mock import MockerFixture
+from requests.adapters import HTTPAdapter
+
+from prometheuspvesd.client import ProxmoxClient, get_endpoint, get_status_class
+from prometheuspvesd.config import Config
+from prometheuspvesd.exception import APIError, APITimeoutError
+
+pytest_plugins = [
+    "prometheuspvesd.test.fixtures.fixtures",
+]
+
+
+def get_sample(name: str) -> float:
+    return REGISTRY.get_sample_value(name) or 0.0
+
+
+@pytest.fixture
+def client(mocker: MockerFixture) -> ProxmoxClient:
+    mocker.patch.object(ProxmoxClient, "_auth", return_value=mocker.create_autospec(ProxmoxAPI))
+
+    return ProxmoxClient()
+
+
+def test_request_cache(client: ProxmoxClient, instance_config: dict[str, Any]) -> None:
+    client.client.get.return_value = instance_config
+    hits = get_sample("pve_sd_requests_cache_hit_total")
+    misses = get_sample("pve_sd_requests_cache_miss_total")
+
+    with client.request_cache():
+        assert client.get_instance_config("dummy", "qemu", "100") == instance_config
+        assert client.get_instance_config("dummy", "qemu", "100") == instance_config
+        client.get_instance_config("dummy", "qemu", "101")
+
+    assert client.client.get.call_count == 2
+    assert get_sample("pve_sd_requests_cache_hit_total") - hits == 1
+    assert get_sample("pve_sd_requests_cache_miss_total") - misses == 2
+
+
+def test_request_cache_cleared(client: ProxmoxClient, instance_config: dict[str, Any]) -> None:
+    client.client.get.return_value = instance_config
+
+    with client.request_cache():
+        client.get_instance_config("dummy", "qemu", "100")
+
+    with client.request_cache():
+        client.get_instance_config("dummy", "qemu", "100")
+
+    client.get_instance_config("dummy", "qemu", "100")
+
+    assert client.client.get.call_count == 3
+
+
+@pytest.mark.parametrize("keep_alive", [True, False])
+def test_auth_session_pool(
+    mocker: MockerFixture, builtins: dict[str, Any], keep_alive: bool
+) -> None:
+    builtins["pve.pool_size"]["default"] = 32
+    builtins["pve.keep_alive"]["default"] = keep_alive
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    api = mocker.patch("prometheuspvesd.client.ProxmoxAPI")
+    session = api.return_value._store["session"]
+    session.headers = {"Connection": "keep-alive"}
+
+    client = ProxmoxClient()
+
+    assert client.client is api.return_value
+    assert client.adapter._pool_maxsize == 32  # type: ignore[attr-defined]
+    session.mount.assert_called_once_with("https://", client.adapter)
+    assert session.headers["Connection"] == ("keep-alive" if keep_alive else "close")
+
+
+def test_connection_stats(client: ProxmoxClient) -> None:
+    pool = client.adapter.poolmanager.connection_from_url("https://proxmox.example.com:8006")
+    assert client._get_connection_stats() == {"active": 0, "idle": 0}
+
+    conn = pool._get_conn()
+    assert client._get_connection_stats() == {"active": 1, "idle": 0}
+    assert REGISTRY.get_sample_value("pve_sd_connections", {"state": "active"}) == 1
+
+    pool._put_conn(conn)
+    assert client._get_connection_stats() == {"active": 0, "idle": 1}
+    assert REGISTRY.get_sample_value("pve_sd_connections", {"state": "idle"}) == 1
+
+
+def test_request_retry(mocker: MockerFixture, client: ProxmoxClient) -> None:
+    sleep = mocker.patch("prometheuspvesd.client.sleep")
+    client.client.get.side_effect = [
+        requests.ConnectionError("Dummy Connection Error"),
+        ResourceException(503, "Service Unavailable", "Dummy"),
+        {"data": "dummy"},
+    ]
+    retries = get_sample("pve_sd_requests_retry_total")
+
+    assert client.get_nodes() == {"data": "dummy"}
+    assert client.client.get.call_count == 3
+    assert sleep.call_count == 2
+    assert client.retry_budget == 48
+    assert get_sample("pve_sd_requests_retry_total") - retries == 2
+
+
+def test_request_retry_exhausted(mocker: MockerFixture, client: ProxmoxClient) -> None:
+    mocker.patch("prometheuspvesd.client.sleep")
+    client.client.get.side_effect = requests.Timeout("Dummy Timeout")
+    giveups = get_sample("pve_sd_requests_giveup_total")
+
+    with pytest.raises(APITimeoutError, match="Dummy Timeout"):
+        client.get_nodes()
+
+    assert client.client.get.call_count == 4
+    assert get_sample("pve_sd_requests_giveup_total") - giveups == 1
+
+
+def test_request_retry_budget(mocker: MockerFixture, client: ProxmoxClient) -> None:
+    mocker.patch("prometheuspvesd.client.sleep")
+    client.client.get.side_effect = requests.Timeout("Dummy Timeout")
+    client.retry_budget = 1
+
+    with pytest.raises(APIError):
+        client.get_nodes()
+    with pytest.raises(APIError):
+        client.get_nodes()
+
+    assert client.client.get.call_count == 3
+
+    client.reset_retry_budget()
+    assert client.retry_budget == 50
+
+
+def test_request_no_retry_client_error(mocker: MockerFixture, client: ProxmoxClient) -> None:
+    sleep = mocker.patch("prometheuspvesd.client.sleep")
+    client.client.get.side_effect = ResourceException(403, "Forbidden", "Dummy")
+
+    with pytest.raises(ResourceException):
+        client.get_nodes()
+
+    assert client.client.get.call_count == 1
+    sleep.assert_not_called()
+
+
+def test_request_no_retry_agent(mocker: MockerFixture, client: ProxmoxClient) -> None:
+    sleep = mocker.patch("prometheuspvesd.client.sleep")
+    client.client.get.side_effect = ResourceException(
+        500, "Internal Server Error", "QEMU guest agent is not running"
+    )
+
+    with pytest.raises(ResourceException):
+        client.get_agent_info("pve1", "qemu", "100")
+    with pytest.raises(ResourceException):
+        client.get_network_interfaces("pve1", "100")
+
+    assert client.client.get.call_count == 2
+    assert client.retry_budget == 50
+    sleep.assert_not_called()
+
+
+def test_request_timeout(mocker: MockerFixture, client: ProxmoxClient) -> None:
+    send = mocker.patch.object(HTTPAdapter, "send")
+    request = requests.Request("GET", "https://proxmox.example.com:8006").prepare()
+
+    client.adapter.send(request, timeout=5)
+
+    send.assert_called_once_with(request, timeout=10)
+
+
+@pytest.mark.parametrize(
+    "args,expected",
+    [
+        (("nodes",), ("nodes", "")),
+        (("nodes", "pve1", "qemu"), ("qemu", "pve1")),
+        (("nodes", "pve1", "lxc"), ("lxc", "pve1")),
+        (("nodes", "pve1", "qemu", "100", "config"), ("config", "pve1")),
+        (("nodes", "pve1", "qemu", "100", "agent", "info"), ("agent_info", "pve1")),
+        (
+            ("nodes", "pve1", "qemu", "100", "agent", "network-get-interfaces"),
+            ("interfaces", "pve1"),
+        ),
+        (("cluster", "resources"), ("cluster_resources", "")),
+        (("pools", "prod"), ("pool", "")),
+        (
+            ("nodes", "pve1", "lxc", "101", "status", "current"),
+            ("nodes/{node}/lxc/{vmid}/status/current", "pve1"),
+        ),
+        (("cluster", "ha", "resources", "102"), ("cluster/ha/resources/{vmid}", "")),
+    ],
+)
+def test_get_endpoint(args: tuple[str, ...], expected: tuple[str, str]) -> None:
+    assert get_endpoint(args) == expected
+
+
+@pytest.mark.parametrize("node_labels", [True, False])
+def test_request_time(mocker: MockerFixture, builtins: dict[str, Any], node_labels: bool) -> None:
+    builtins["metrics.node_labels"]["default"] = node_labels
+
+    mocker.patch.dict(Config.SETTINGS, builtins)
+    mocker.patch.object(ProxmoxClient, "_auth", return_value=mocker.create_autospec(ProxmoxAPI))
+    client = ProxmoxClient()
+    labels = {"endpoint": "qemu", "node": "pve1" if node_labels else "", "status": "2xx"}
+    count = REGISTRY.get_sample_value("pve_sd_api_request_seconds_count", labels) or 0
+
+    client.get_all_vms("pve1")
+
+    assert REGISTRY.get_sample_value("pve_sd_api_request_seconds_count", labels) == count + 1
+
+
+@pytest.mark.parametrize(
+    "error,expected",
+    [
+        (None, "2xx"),
+        (ResourceException(403, "Forbidden", "Dummy"), "4xx"),
+        (ResourceException(503, "Service Unavailable", "Dummy"), "5xx"),
+        (requests.Timeout("Dummy Timeout"), "timeout"),
+        (TimeoutError(), "timeout"),
+        (requests.ConnectionError("Dummy Connection Error"), "error"),
+    ],
+)
+def test_get_status_class(error: Exception | None, expected: str) -> None:
+    assert get_status_class(error) == expected
+
+
+def test_request_errors(mocker: MockerFixture, client: ProxmoxClient) -> None:
+    mocker.patch("prometheuspvesd.client.sleep")
+    client.client.get.side_effect = [
+        ResourceException(503, "Service Unavailable", "Dummy"),
+        requests.Timeout("Dummy Timeout"),
+        {"data": "dummy"},
+    ]
+    labels = {"endpoint": "config", "node": ""}
+    errors = {
+        status: REGISTRY.get_sample_value(
+            "pve_sd_api_request_errors_total", {**labels, "status": status}
+        )
+        or 0
+        for status in ["5xx", "timeout"]
+    }
+
+    client.get_instance_config("pve1", "qemu", "100")
+
+    for status, count in errors.items():
+        assert (
+            REGISTRY.get_sample_value(
+                "pve_sd_api_request_errors_total", {**labels, "status": status}
+            )
+            == count + 1
+        )
@@ -4,11 +4,16 @@ import logging
 from typing import Any
 
 import pytest
-from proxmoxer import ProxmoxAPI
+from prometheus_client import REGISTRY
+from proxmoxer import ProxmoxAPI, ResourceException
 from pytest_mock import MockerFixture
 
+from prometheuspvesd.aioclient import AsyncProxmoxClient
 from prometheuspvesd.client import ProxmoxClient
+from prometheuspvesd.config import Config
 from prometheuspvesd.discovery import Discovery
+from prometheuspvesd.exception import APIError, APITimeoutError
+from prometheuspvesd.filters import get_shard
 from prometheuspvesd.model import HostList
 from prometheuspvesd.test.unit.test_types import LogContextFactory
 
@@ -122,9 +127,13 @@ def test_validate_ip(discovery: Discovery, addresses: dict[str, str]) -> None:
 
 
 def test_get_ip_addresses(
-    mocker: MockerFixture, discovery: Discovery, networks: list[dict[str, Any]]
+    mocker: MockerFixture,
+    discovery: Discovery,
+    networks: list[dict[str, Any]],
+    instance_config: dict[str, Any],
 ) -> None:
     mocker.patch.object(ProxmoxClient, "get_network_interfaces", return_value=networks)
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
 
     assert discovery._get_ip_addresses("qemu", "dummy", "dummy") == (
         networks[1]["ip-addresses"][0]["ip-address"],
@@ -144,6 +153,76 @@ def test_get_ip_addresses_from_instance_config(
     )
 
 
+@pytest.mark.parametrize(
+    "agent,status,expected",
+    [
+        ("1", "running", "ok"),
+        ("enabled=1,fstrim_cloned_disks=1", "running", "ok"),
+        ("fstrim_cloned_disks=1,enabled=1", None, "ok"),
+        ("0", "running", "disabled"),
+        ("enabled=0", "running", "disabled"),
+        (None, "running", "disabled"),
+        ("1", "stopped", "disabled"),
+    ],
+)
+def test_get_ip_addresses_agent(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    networks: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+    agent: str | None,
+    status: str | None,
+    expected: str,
+) -> None:
+    instance_config["agent"] = agent
+    if agent is None:
+        del instance_config["agent"]
+
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+    get_agent_info = mocker.patch.object(ProxmoxClient, "get_agent_info", return_value={})
+    mocker.patch.object(ProxmoxClient, "get_network_interfaces", return_value=networks)
+    before = REGISTRY.get_sample_value("pve_sd_agent_requests_total", {"outcome": expected}) or 0
+
+    host_meta = {"proxmox_status": status} if status else {}
+    ipv4, _ = discovery._get_ip_addresses("qemu", "dummy", "100", host_meta)
+
+    assert get_agent_info.called == (expected == "ok")
+    assert ipv4 == ("192.0.2.25" if expected == "disabled" else "192.0.2.1")
+    assert (
+        REGISTRY.get_sample_value("pve_sd_agent_requests_total", {"outcome": expected})
+        == before + 1
+    )
+
+
+@pytest.mark.parametrize(
+    "error,expected",
+    [
+        (APITimeoutError("Read timed out"), "timeout"),
+        (ResourceException(500, "Internal Server Error", "got timeout"), "timeout"),
+        (ResourceException(500, "Internal Server Error", "agent is not running"), "error"),
+    ],
+)
+def test_get_ip_addresses_agent_error(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    instance_config: dict[str, Any],
+    error: Exception,
+    expected: str,
+) -> None:
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+    mocker.patch.object(ProxmoxClient, "get_agent_info", side_effect=error)
+    before = REGISTRY.get_sample_value("pve_sd_agent_requests_total", {"outcome": expected}) or 0
+
+    assert discovery._get_ip_addresses("qemu", "dummy", "100", {"proxmox_status": "running"}) == (
+        "192.0.2.25",
+        "2001:db8::666:77:8888",
+    )
+    assert (
+        REGISTRY.get_sample_value("pve_sd_agent_requests_total", {"outcome": expected})
+        == before + 1
+    )
+
+
 def test_propagate(
     mocker: MockerFixture,
     discovery: Discovery,
@@ -154,6 +233,9 @@ def test_propagate(
     networks: list[dict[str, Any]],
     inventory: HostList,
 ) -> None:
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["inventory"] = "nodes"
+
     mocker.patch.object(ProxmoxClient, "get_nodes", return_value=nodes)
     mocker.patch.object(ProxmoxClient, "get_all_vms", return_value=qemus)
     mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
@@ -172,6 +254,9 @@ def test_duplicate_vm_names(
     networks: list[dict[str, Any]],
 ) -> None:
     """Test that VMs with duplicate names are handled correctly using vmid as key."""
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["inventory"] = "nodes"
+
     # Create duplicate names by modifying the existing qemus fixture
     duplicate_name_vms = [vm.copy() for vm in qemus]
     for vm in duplicate_name_vms:
@@ -213,6 +298,9 @@ def test_ip_change_reflected_in_next_cycle(
     agent_info: dict[str, Any],
 ) -> None:
     """Confirm that a VM IP change is reflected in the next discovery cycle."""
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["inventory"] = "nodes"
+
     vm = {
         "vmid": "101",
         "name": "vm101.example.com",
@@ -232,7 +320,7 @@ def test_ip_change_reflected_in_next_cycle(
         "cpus": 1,
     }
 
-    instance_config = {"name": "vm101.example.com", "description": "{}"}
+    instance_config = {"name": "vm101.example.com", "description": "{}", "agent": "1"}
 
     # VM has IP 192.0.2.10
     networks1 = [
@@ -276,3 +364,636 @@ def test_ip_change_reflected_in_next_cycle(
     assert result2.hosts[0].ipv4_address == "10.0.0.99", (
         "IP change was not reflected in the second discovery cycle. "
     )
+
+
+@pytest.mark.parametrize("workers", [1, 8])
+def test_propagate_workers(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    nodes: list[dict[str, Any]],
+    qemus: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+    agent_info: dict[str, Any],
+    networks: list[dict[str, Any]],
+    workers: int,
+) -> None:
+    """Concurrent discovery must return the same hosts in the same order as sequential."""
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["workers"] = workers
+    discovery.config.config["discovery"]["inventory"] = "nodes"
+
+    second_node = {**nodes[0], "node": "example-node-2", "id": "node/example-node-2"}
+    second_qemus = [{**vm, "vmid": str(int(vm["vmid"]) + 100)} for vm in qemus]
+
+    mocker.patch.object(ProxmoxClient, "get_nodes", return_value=[nodes[0], second_node])
+    mocker.patch.object(
+        ProxmoxClient,
+        "get_all_vms",
+        side_effect=lambda node: qemus if node == "example-node" else second_qemus,
+    )
+    mocker.patch.object(ProxmoxClient, "get_all_containers", return_value=[])
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+    mocker.patch.object(ProxmoxClient, "get_agent_info", return_value=agent_info)
+    mocker.patch.object(ProxmoxClient, "get_network_interfaces", return_value=networks)
+
+    result = discovery.propagate()
+
+    assert [host.vmid for host in result.hosts] == ["100", "101", "102", "200", "201", "202"]
+
+
+def test_propagate_cluster_resources(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+    agent_info: dict[str, Any],
+    networks: list[dict[str, Any]],
+    inventory: HostList,
+) -> None:
+    get_nodes = mocker.patch.object(ProxmoxClient, "get_nodes")
+    get_all_vms = mocker.patch.object(ProxmoxClient, "get_all_vms")
+    mocker.patch.object(ProxmoxClient, "get_cluster_resources", return_value=resources)
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+    mocker.patch.object(ProxmoxClient, "get_agent_info", return_value=agent_info)
+    mocker.patch.object(ProxmoxClient, "get_network_interfaces", return_value=networks)
+
+    result = discovery.propagate()
+
+    assert result == inventory
+    assert [host.pve_type for host in result.hosts] == ["qemu", "qemu", "qemu"]
+    get_nodes.assert_not_called()
+    get_all_vms.assert_not_called()
+
+
+def test_propagate_phase_time(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+) -> None:
+    mocker.patch.object(ProxmoxClient, "get_cluster_resources", return_value=resources)
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+    phases = ["guests", "filter", "config", "agent", "update"]
+    counts = [
+        REGISTRY.get_sample_value("pve_sd_phase_seconds_count", {"phase": phase}) or 0
+        for phase in phases
+    ]
+
+    discovery.propagate()
+
+    assert [
+        REGISTRY.get_sample_value("pve_sd_phase_seconds_count", {"phase": phase})
+        for phase in phases
+    ] == [count + 1 for count in counts]
+    assert discovery.filter_time > 0
+    assert (
+        REGISTRY.get_sample_value("pve_sd_phase_seconds_bucket", {"phase": "agent", "le": "600.0"})
+        is not None
+    )
+
+
+def test_propagate_host_gauges(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+) -> None:
+    mocker.patch.object(ProxmoxClient, "get_cluster_resources", return_value=resources)
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+
+    discovery.propagate()
+
+    assert REGISTRY.get_sample_value("pve_sd_hosts") == 3
+    assert REGISTRY.get_sample_value("pve_sd_hosts_by_node", {"node": "example-node"}) == 3
+    assert (
+        REGISTRY.get_sample_value("pve_sd_hosts_by_type", {"type": "qemu", "status": "running"})
+        == 2
+    )
+    assert (
+        REGISTRY.get_sample_value("pve_sd_hosts_by_type", {"type": "qemu", "status": "prelaunch"})
+        == 1
+    )
+    assert REGISTRY.get_sample_value("pve_sd_hosts_filtered", {"reason": "template"}) == 1
+
+    # Series of nodes and reasons that are gone are removed
+    for resource in resources:
+        resource["node"] = "other-node"
+    resources[3]["template"] = 0
+    discovery.propagate()
+
+    assert REGISTRY.get_sample_value("pve_sd_hosts") == 4
+    assert REGISTRY.get_sample_value("pve_sd_hosts_by_node", {"node": "example-node"}) is None
+    assert REGISTRY.get_sample_value("pve_sd_hosts_by_node", {"node": "other-node"}) == 4
+    assert REGISTRY.get_sample_value("pve_sd_hosts_filtered", {"reason": "template"}) is None
+
+
+def test_propagate_cluster_resources_fallback(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    nodes: list[dict[str, Any]],
+    qemus: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+    agent_info: dict[str, Any],
+    networks: list[dict[str, Any]],
+    inventory: HostList,
+    local_caplog: LogContextFactory,
+) -> None:
+    mocker.patch.object(
+        ProxmoxClient, "get_cluster_resources", side_effect=APIError("Dummy API Exception")
+    )
+    mocker.patch.object(ProxmoxClient, "get_nodes", return_value=nodes)
+    mocker.patch.object(ProxmoxClient, "get_all_vms", return_value=qemus)
+    mocker.patch.object(ProxmoxClient, "get_all_containers", return_value=[])
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+    mocker.patch.object(ProxmoxClient, "get_agent_info", return_value=agent_info)
+    mocker.patch.object(ProxmoxClient, "get_network_interfaces", return_value=networks)
+
+    with local_caplog(level=logging.WARNING) as caplog:
+        result = discovery.propagate()
+
+    assert result == inventory
+    assert (
+        "Unable to fetch cluster resources, using node listings: Dummy API Exception"
+        in records_to_messages(caplog.records)
+    )
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ({}, 3),
+        ({"status": "stopped"}, 4),
+        ({"uptime": 10}, 4),
+        ({"uptime": 3101565}, 3),
+        ({"maxcpu": 4}, 4),
+    ],
+)
+def test_propagate_incremental(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+    agent_info: dict[str, Any],
+    networks: list[dict[str, Any]],
+    test_input: dict[str, Any],
+    expected: int,
+) -> None:
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["incremental"] = True
+
+    mocker.patch.object(ProxmoxClient, "get_cluster_resources", return_value=resources)
+    get_config = mocker.patch.object(
+        ProxmoxClient, "get_instance_config", return_value=instance_config
+    )
+    mocker.patch.object(ProxmoxClient, "get_agent_info", return_value=agent_info)
+    mocker.patch.object(ProxmoxClient, "get_network_interfaces", return_value=networks)
+
+    first = discovery.propagate()
+    hosts = list(first.hosts)
+
+    # Change the listing of a single guest
+    resources[0].update(test_input)
+    second = discovery.propagate()
+
+    assert [host.vmid for host in second.hosts] == ["100", "101", "102"]
+    assert second.hosts[1] is hosts[1]
+    assert get_config.call_count == expected
+
+
+def test_propagate_incremental_resync(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+) -> None:
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["incremental"] = True
+    discovery.config.config["discovery"]["resync_interval"] = 0
+
+    mocker.patch.object(ProxmoxClient, "get_cluster_resources", return_value=resources)
+    get_config = mocker.patch.object(
+        ProxmoxClient, "get_instance_config", return_value=instance_config
+    )
+
+    discovery.propagate()
+    discovery.propagate()
+
+    assert get_config.call_count == 6
+
+
+def test_propagate_refresh(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+    agent_info: dict[str, Any],
+    networks: list[dict[str, Any]],
+) -> None:
+    mocker.patch.object(ProxmoxClient, "get_cluster_resources", return_value=resources)
+    get_config = mocker.patch.object(
+        ProxmoxClient, "get_instance_config", return_value=instance_config
+    )
+    mocker.patch.object(ProxmoxClient, "get_agent_info", return_value=agent_info)
+    mocker.patch.object(ProxmoxClient, "get_network_interfaces", return_value=networks)
+
+    hosts = list(discovery.propagate().hosts)
+    result = discovery.propagate(refresh={"101"})
+
+    assert [host.vmid for host in result.hosts] == ["100", "101", "102"]
+    assert result.hosts[0] is hosts[0]
+    assert result.hosts[1] is not hosts[1]
+    assert get_config.call_count == 4
+
+
+def test_poll_events(mocker: MockerFixture, discovery: Discovery) -> None:
+    tasks: list[dict[str, Any]] = [
+        {"upid": "UPID:1", "node": "pve1", "type": "qmstart", "id": "100", "endtime": 1001},
+        {"upid": "UPID:2", "node": "pve1", "type": "vzstop", "id": "101", "endtime": 999},
+        {"upid": "UPID:3", "node": "pve1", "type": "qmstart", "id": "102"},
+        {"upid": "UPID:4", "node": "pve1", "type": "vncproxy", "id": "104", "endtime": 1002},
+        {"upid": "UPID:5", "node": "pve2", "type": "qmigrate", "id": "105", "endtime": 1002},
+    ]
+    mocker.patch.object(ProxmoxClient, "get_cluster_tasks", return_value=tasks)
+    discovery.events_since = 1000
+    events = REGISTRY.get_sample_value("pve_sd_events_total", {"type": "qmstart"})
+
+    assert discovery.poll_events() == {"100", "105"}
+    assert discovery.events_since == 1002
+    assert (
+        REGISTRY.get_sample_value("pve_sd_events_total", {"type": "qmstart"}) == (events or 0) + 1
+    )
+
+    tasks[2]["endtime"] = 1002
+    assert discovery.poll_events() == {"102"}
+    assert discovery.poll_events() == set()
+
+
+def test_poll_events_async(mocker: MockerFixture, builtins: dict[str, Any]) -> None:
+    builtins["discovery.backend"]["default"] = "async"
+    mocker.patch.dict(Config.SETTINGS, builtins)
+
+    auth = mocker.patch.object(AsyncProxmoxClient, "_auth")
+    mocker.patch.object(AsyncProxmoxClient, "get_cluster_tasks", return_value=[])
+
+    discovery = Discovery()
+    discovery.poll_events()
+    session = discovery.aclient.client
+    discovery.poll_events()
+
+    # Polls share the session and ticket instead of logging in again
+    assert discovery.aclient.client is session
+    auth.assert_awaited_once()
+
+    discovery.close()
+    assert discovery.aclient.client is None
+
+
+@pytest.mark.parametrize("inventory_mode", ["cluster", "nodes"])
+def test_propagate_async(
+    mocker: MockerFixture,
+    nodes: list[dict[str, Any]],
+    qemus: list[dict[str, Any]],
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+    agent_info: dict[str, Any],
+    networks: list[dict[str, Any]],
+    inventory: HostList,
+    builtins: dict[str, Any],
+    inventory_mode: str,
+) -> None:
+    builtins["discovery.backend"]["default"] = "async"
+    builtins["discovery.inventory"]["default"] = inventory_mode
+    mocker.patch.dict(Config.SETTINGS, builtins)
+
+    connect = mocker.patch.object(AsyncProxmoxClient, "connect")
+    close = mocker.patch.object(AsyncProxmoxClient, "close")
+    mocker.patch.object(AsyncProxmoxClient, "get_cluster_resources", return_value=resources)
+    mocker.patch.object(AsyncProxmoxClient, "get_nodes", return_value=nodes)
+    mocker.patch.object(AsyncProxmoxClient, "get_all_vms", return_value=qemus)
+    mocker.patch.object(AsyncProxmoxClient, "get_all_containers", return_value=[])
+    mocker.patch.object(AsyncProxmoxClient, "get_instance_config", return_value=instance_config)
+    mocker.patch.object(AsyncProxmoxClient, "get_agent_info", return_value=agent_info)
+    mocker.patch.object(AsyncProxmoxClient, "get_network_interfaces", return_value=networks)
+
+    discovery = Discovery()
+
+    assert not hasattr(discovery, "client")
+    assert discovery.propagate() == inventory
+    assert discovery.propagate() == inventory
+    assert connect.await_count == 2
+
+    discovery.close()
+    close.assert_awaited_once()
+    assert discovery.loop.is_closed()
+
+
+def test_propagate_node_failure(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    nodes: list[dict[str, Any]],
+    qemus: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+) -> None:
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["inventory"] = "nodes"
+    discovery.config.config["discovery"]["stale_max_age"] = 600
+
+    second_node = {**nodes[0], "node": "example-node-2", "id": "node/example-node-2"}
+    second_qemus = [{**vm, "vmid": str(int(vm["vmid"]) + 100)} for vm in qemus]
+    failed: set[str] = set()
+
+    def get_all_vms(node: str) -> list[dict[str, Any]]:
+        if node in failed:
+            raise APIError("Dummy API Exception")
+        return qemus if node == "example-node" else second_qemus
+
+    monotonic = mocker.patch("prometheuspvesd.discovery.monotonic", return_value=1000.0)
+    mocker.patch.object(ProxmoxClient, "get_nodes", return_value=[nodes[0], second_node])
+    mocker.patch.object(ProxmoxClient, "get_all_vms", side_effect=get_all_vms)
+    mocker.patch.object(ProxmoxClient, "get_all_containers", return_value=[])
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+
+    discovery.propagate()
+
+    failed.add("example-node-2")
+    monotonic.return_value = 1300.0
+    result = discovery.propagate()
+
+    assert [host.vmid for host in result.hosts] == ["100", "101", "102", "200", "201", "202"]
+    assert [host.labels.get("__meta_pve_stale") for host in result.hosts] == [None] * 3 + [
+        "true"
+    ] * 3
+    assert REGISTRY.get_sample_value("pve_sd_node_up", {"node": "example-node"}) == 1
+    assert REGISTRY.get_sample_value("pve_sd_node_up", {"node": "example-node-2"}) == 0
+    assert (
+        REGISTRY.get_sample_value("pve_sd_node_stale_seconds", {"node": "example-node-2"}) == 300
+    )
+
+    monotonic.return_value = 1700.0
+    result = discovery.propagate()
+
+    assert [host.vmid for host in result.hosts] == ["100", "101", "102"]
+
+    failed.clear()
+    result = discovery.propagate()
+
+    assert len(result) == 6
+    assert all("__meta_pve_stale" not in host.labels for host in result.hosts)
+    assert REGISTRY.get_sample_value("pve_sd_node_up", {"node": "example-node-2"}) == 1
+
+
+def test_propagate_guest_failure(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+) -> None:
+    failed: set[str] = set()
+
+    def get_instance_config(_node: str, _pve_type: str, vmid: str) -> dict[str, Any]:
+        if str(vmid) in failed:
+            raise APIError("Dummy API Exception")
+        return instance_config
+
+    mocker.patch.object(ProxmoxClient, "get_cluster_resources", return_value=resources)
+    mocker.patch.object(ProxmoxClient, "get_instance_config", side_effect=get_instance_config)
+
+    # Guests without a last-known-good state are skipped
+    failed.add("100")
+    assert [host.vmid for host in discovery.propagate().hosts] == ["101", "102"]
+
+    failed.clear()
+    discovery.propagate()
+
+    # A failed guest does not keep guests of its node that were removed in the same pass
+    failed.add("101")
+    resources.pop(2)
+    result = discovery.propagate()
+
+    assert [host.vmid for host in result.hosts] == ["100", "101"]
+    assert result.hosts[1].labels["__meta_pve_stale"] == "true"
+    assert REGISTRY.get_sample_value("pve_sd_node_up", {"node": "example-node"}) == 1
+
+
+def test_propagate_cluster_node_status(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+) -> None:
+    second_guests = [
+        {**item, "vmid": item["vmid"] + 100, "node": "example-node-2"} for item in resources
+    ]
+    node_entries = [
+        {"id": f"node/{node}", "type": "node", "node": node, "status": "online"}
+        for node in ("example-node", "example-node-2")
+    ]
+    storage = {"id": "storage/example-node/local", "type": "storage", "node": "example-node"}
+    failed: set[str] = set()
+
+    def get_instance_config(node: str, _pve_type: str, _vmid: str) -> dict[str, Any]:
+        if node in failed:
+            raise APIError("595 Errors during connection establishment")
+        return instance_config
+
+    mocker.patch.object(
+        ProxmoxClient,
+        "get_cluster_resources",
+        return_value=[*node_entries, storage, *resources, *second_guests],
+    )
+    get_config = mocker.patch.object(
+        ProxmoxClient, "get_instance_config", side_effect=get_instance_config
+    )
+
+    assert len(discovery.propagate()) == 6
+
+    # Guests of offline nodes are not requested and keep their last-known-good host
+    node_entries[1]["status"] = "offline"
+    get_config.reset_mock()
+    result = discovery.propagate()
+
+    assert [host.labels.get("__meta_pve_stale") for host in result.hosts] == [None] * 3 + [
+        "true"
+    ] * 3
+    assert {call.args[0] for call in get_config.call_args_list} == {"example-node"}
+    assert REGISTRY.get_sample_value("pve_sd_node_up", {"node": "example-node-2"}) == 0
+
+    # A node is down if the details of all of its guests could not be fetched
+    failed.add("example-node")
+    result = discovery.propagate()
+
+    assert all(host.labels.get("__meta_pve_stale") == "true" for host in result.hosts)
+    assert REGISTRY.get_sample_value("pve_sd_node_up", {"node": "example-node"}) == 0
+
+
+def test_propagate_agent_cache(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+    agent_info: dict[str, Any],
+    networks: list[dict[str, Any]],
+) -> None:
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["agent_cache_ttl"] = 600
+
+    monotonic = mocker.patch("prometheuspvesd.discovery.monotonic", return_value=1000.0)
+    mocker.patch.object(ProxmoxClient, "get_cluster_resources", return_value=resources)
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+    mocker.patch.object(ProxmoxClient, "get_agent_info", return_value=agent_info)
+    get_networks = mocker.patch.object(
+        ProxmoxClient, "get_network_interfaces", return_value=networks
+    )
+
+    # Only running guests 100 and 101 are queried
+    first = discovery.propagate()
+    assert get_networks.call_count == 2
+
+    monotonic.return_value = 1300.0
+    second = discovery.propagate()
+    assert get_networks.call_count == 2
+    assert [host.ipv4_address for host in second.hosts] == [
+        host.ipv4_address for host in first.hosts
+    ]
+
+    # Restarted or migrated guests are queried again
+    resources[0]["uptime"] = 10
+    resources[1]["node"] = "example-node-2"
+    discovery.propagate()
+    assert get_networks.call_count == 4
+    assert set(discovery.agent_cache) == {("example-node", "100"), ("example-node-2", "101")}
+
+    # Expired addresses are refreshed
+    monotonic.return_value = 1900.0
+    discovery.propagate()
+    assert get_networks.call_count == 6
+
+
+def test_propagate_node_scope(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    nodes: list[dict[str, Any]],
+    qemus: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+) -> None:
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["inventory"] = "nodes"
+    discovery.config.config["include_nodes"] = ["example-node-2"]
+
+    second_node = {**nodes[0], "node": "example-node-2", "id": "node/example-node-2"}
+    mocker.patch.object(ProxmoxClient, "get_nodes", return_value=[nodes[0], second_node])
+    get_all_vms = mocker.patch.object(ProxmoxClient, "get_all_vms", return_value=qemus)
+    mocker.patch.object(ProxmoxClient, "get_all_containers", return_value=[])
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+    get_pool = mocker.patch.object(ProxmoxClient, "get_pool")
+
+    result = discovery.propagate()
+
+    assert len(result) == 3
+    get_all_vms.assert_called_once_with("example-node-2")
+    get_pool.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ({"include_pools": ["prod"]}, ["101"]),
+        ({"include_pools": ["prod", "missing"], "include_names": ["100.*"]}, []),
+        ({"exclude_pools": ["prod"]}, ["100", "102"]),
+    ],
+)
+def test_propagate_pools(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    nodes: list[dict[str, Any]],
+    qemus: list[dict[str, Any]],
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+    test_input: dict[str, Any],
+    expected: list[str],
+) -> None:
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["inventory"] = "nodes"
+    discovery.config.config.update(test_input)
+
+    pools = {
+        "prod": {
+            "members": [
+                resources[1],
+                {"id": "storage/example-node/local", "type": "storage", "storage": "local"},
+            ]
+        }
+    }
+
+    def get_pool(poolid: str) -> dict[str, Any]:
+        if poolid not in pools:
+            raise ResourceException(
+                500, "Internal Server Error", f"pool '{poolid}' does not exist"
+            )
+        return pools[poolid]
+
+    get_nodes = mocker.patch.object(ProxmoxClient, "get_nodes", return_value=nodes)
+    mocker.patch.object(ProxmoxClient, "get_all_vms", return_value=qemus)
+    mocker.patch.object(ProxmoxClient, "get_all_containers", return_value=[])
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+    mocker.patch.object(ProxmoxClient, "get_pool", side_effect=get_pool)
+
+    result = discovery.propagate()
+
+    assert [host.vmid for host in result.hosts] == expected
+    assert get_nodes.called == ("include_pools" not in test_input)
+
+
+@pytest.mark.parametrize("pool_filter", ["include_pools", "exclude_pools"])
+def test_propagate_pools_error(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    nodes: list[dict[str, Any]],
+    qemus: list[dict[str, Any]],
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+    pool_filter: str,
+) -> None:
+    assert discovery.config.config is not None
+    discovery.config.config["discovery"]["inventory"] = "nodes"
+    discovery.config.config[pool_filter] = ["prod"]
+
+    mocker.patch.object(ProxmoxClient, "get_nodes", return_value=nodes)
+    mocker.patch.object(ProxmoxClient, "get_all_vms", return_value=qemus)
+    mocker.patch.object(ProxmoxClient, "get_all_containers", return_value=[])
+    mocker.patch.object(ProxmoxClient, "get_instance_config", return_value=instance_config)
+    get_pool = mocker.patch.object(
+        ProxmoxClient, "get_pool", return_value={"members": [resources[1]]}
+    )
+
+    previous = [host.vmid for host in discovery.propagate().hosts]
+
+    # Transient errors fail the pass instead of publishing targets without pool members
+    get_pool.side_effect = ResourceException(503, "Service Unavailable", "")
+    with pytest.raises(APIError, match="Unable to fetch members of pool prod"):
+        discovery.propagate()
+
+    assert [host.vmid for host in discovery.host_list] == previous
+
+
+def test_propagate_shard(
+    mocker: MockerFixture,
+    discovery: Discovery,
+    resources: list[dict[str, Any]],
+    instance_config: dict[str, Any],
+) -> None:
+    assert discovery.config.config is not None
+    discovery.config.config["shard"] = {"count": 2, "index": 1}
+
+    mocker.patch.object(ProxmoxClient, "get_cluster_resources", return_value=resources)
+    get_config = mocker.patch.object(
+        ProxmoxClient, "get_instance_config", return_value=instance_config
+    )
+
+    result = discovery.propagate()
+
+    # Guest details are only fetched for guests of this shard
+    assert [host.vmid for host in result.hosts] == [
+        vmid for vmid in ("100", "101", "102") if get_shard(vmid, 2) == 1
+    ]
+    assert get_config.call_count == len(result)
@@ -0,0 +1,138 @@
+"""Test GuestFilter class."""
+
+from typing import Any
+
+import pytest
+
+from prometheuspvesd.exception import ConfigError
+from prometheuspvesd.filters import FILTER_OPTIONS, GuestFilter, get_shard
+
+pytest_plugins = [
+    "prometheuspvesd.test.fixtures.fixtures",
+]
+
+
+@pytest.fixture
+def options() -> dict[str, Any]:
+    return {**{option: [] for option in FILTER_OPTIONS}, "shard": {"count": 1, "index": 0}}
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ({}, {"template": 1}),
+        ({"exclude_vmid": [100, "101"]}, {"exclude_vmid": 2, "template": 1}),
+        ({"include_vmid": ["101"], "exclude_tags": ["monitored"]}, {"include_vmid": 3}),
+        (
+            {"exclude_state": ["prelaunch"], "exclude_tags": ["unmonitored"]},
+            {
+                "exclude_state": 1,
+                "exclude_tags": 1,
+                "template": 1,
+            },
+        ),
+        ({"include_tags": ["postgres"]}, {"include_tags": 3}),
+    ],
+)
+def test_filter_reasons(
+    resources: list[dict[str, Any]],
+    options: dict[str, Any],
+    test_input: dict[str, Any],
+    expected: dict[str, int],
+) -> None:
+    options.update(test_input)
+    excluded: dict[str, int] = {}
+
+    kept = GuestFilter(options).apply(resources, excluded)
+
+    assert excluded == expected
+    assert len(kept) == len(resources) - sum(expected.values())
+    assert all(any(item is resource for resource in resources) for item in kept)
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        ({"include_nodes": ["example-node"]}, ["100", "101", "102"]),
+        ({"exclude_nodes": ["example-node"]}, []),
+        ({"include_pools": ["prod"]}, ["101"]),
+        ({"exclude_pools": ["prod"]}, ["100", "102"]),
+        ({"include_names": ["10[01].*"]}, ["100", "101"]),
+        ({"exclude_names": ["*.example.com"]}, []),
+        ({"include_tags_regex": ["postgre.*"]}, ["100"]),
+        ({"include_tags_regex": ["postgre"]}, []),
+        ({"exclude_tags_regex": ["un.*", "dummy"]}, ["101", "102"]),
+    ],
+)
+def test_filter_expressions(
+    resources: list[dict[str, Any]],
+    options: dict[str, Any],
+    test_input: dict[str, Any],
+    expected: list[str],
+) -> None:
+    options.update(test_input)
+    resources[1]["pool"] = "prod"
+
+    kept = GuestFilter(options).apply(resources)
+
+    assert [str(item["vmid"]) for item in kept] == expected
+
+
+def test_filter_invalid_regex(options: dict[str, Any]) -> None:
+    options["exclude_tags_regex"] = ["team-("]
+
+    with pytest.raises(ConfigError, match="Option 'exclude_tags_regex' contains an invalid"):
+        GuestFilter(options)
+
+
+def test_filter_nodes(options: dict[str, Any]) -> None:
+    options["include_nodes"] = ["node-1", "node-2"]
+    options["exclude_nodes"] = ["node-2"]
+    guest_filter = GuestFilter(options)
+
+    assert guest_filter.is_node_included("node-1")
+    assert not guest_filter.is_node_included("node-2")
+    assert not guest_filter.is_node_included("node-3")
+    # Node listings without the node field are filtered before listing them
+    assert guest_filter.apply([{"vmid": "100", "template": ""}]) == [
+        {"vmid": "100", "template": ""}
+    ]
+
+
+def test_filter_options(options: dict[str, Any]) -> None:
+    guest_filter = GuestFilter(options)
+
+    assert [reason for reason, _ in guest_filter.predicates] == ["template"]
+    assert guest_filter.options == GuestFilter.get_options(options)
+
+    options["exclude_vmid"].append("100")
+    assert guest_filter.options != GuestFilter.get_options(options)
+
+
+def test_filter_shards(options: dict[str, Any]) -> None:
+    items = [{"vmid": str(vmid), "template": ""} for vmid in range(100, 1100)]
+    options["shard"]["count"] = 3
+
+    shards: list[list[dict[str, Any]]] = []
+    for index in range(3):
+        options["shard"]["index"] = index
+        excluded: dict[str, int] = {}
+        shards.append(GuestFilter(options).apply(items, excluded))
+        assert excluded == {"shard": len(items) - len(shards[index])}
+
+    # Every guest is assigned to exactly one shard, roughly balanced
+    assert sorted(item["vmid"] for shard in shards for item in shard) == sorted(
+        item["vmid"] for item in items
+    )
+    assert all(250 < len(shard) < 420 for shard in shards)
+
+
+def test_get_shard_rebalance() -> None:
+    vmids = [str(vmid) for vmid in range(100, 1100)]
+    before = {vmid: get_shard(vmid, 3) for vmid in vmids}
+    after = {vmid: get_shard(vmid, 4) for vmid in vmids}
+
+    # Only guests assigned to the new shard are moved
+    moved = [vmid for vmid in vmids if before[vmid] != after[vmid]]
+    assert all(after[vmid] == 3 for vmid in moved)
+    assert 150 < len(moved) < 350
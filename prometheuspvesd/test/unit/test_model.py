@@ -1,10 +1,10 @@
-"""Test Host class."""
+"""Test Host and HostList classes."""
 
 from typing import Any
 
 import pytest
 
-from prometheuspvesd.model import Host
+from prometheuspvesd.model import Host, HostList
 
 pytest_plugins = [
     "prometheuspvesd.test.fixtures.fixtures",
@@ -58,3 +58,86 @@ def test_host(test_input: Any, expected: Any) -> None:
     )
 
     assert host.labels == expected
+
+
+def test_host_add_label() -> None:
+    host = Host("101", "host1", None, None, "qemu")
+    host.add_label("status", "running")
+    host.add_label("dummy-key value", None)
+    host.add_label("status", "stopped")
+
+    assert not hasattr(host, "__dict__")
+    assert host.to_sd_json() == {
+        "targets": ["host1"],
+        "labels": {
+            "__meta_pve_ipv4": "False",
+            "__meta_pve_ipv6": "False",
+            "__meta_pve_name": "host1",
+            "__meta_pve_type": "qemu",
+            "__meta_pve_vmid": "101",
+            "__meta_pve_status": "stopped",
+            "__meta_pve_dummy_key_value": "False",
+        },
+    }
+    assert host.get_label("status") == "stopped"
+    assert host.get_label("tags") is None
+
+
+def test_host_copy() -> None:
+    host = Host("101", "host1", "192.0.2.1", None, "qemu", "pve1")
+    host.add_label("status", "running")
+
+    copy = host.copy()
+    copy.add_label("stale", "true")
+
+    assert copy.labels == {**host.labels, "__meta_pve_stale": "true"}
+    assert "__meta_pve_stale" not in host.labels
+    assert copy.node == "pve1"
+
+
+def test_host_list(inventory: HostList) -> None:
+    inventory.add_host(Host("100", "duplicate.example.com", None, None, "qemu"))
+    inventory.add_host(Host("100", "100.example.com", None, None, "lxc"))
+
+    assert len(inventory) == 4
+    assert [host.hostname for host in inventory] == [
+        "100.example.com",
+        "101.example.com",
+        "102.example.com",
+        "100.example.com",
+    ]
+
+    host = inventory.get_host("qemu", "101")
+    assert host is not None
+    assert host.hostname == "101.example.com"
+    assert inventory.host_exists(host)
+
+    inventory.remove_host(host)
+    assert inventory.get_host("qemu", "101") is None
+    assert not inventory.host_exists(host)
+
+
+def test_host_list_eq(inventory: HostList) -> None:
+    other = HostList()
+    for host in reversed(inventory.hosts):
+        other.add_host(Host(host.vmid, "dummy", None, None, host.pve_type))
+
+    assert inventory == other
+
+    other.add_host(Host("103", "103.example.com", None, None, "qemu"))
+    assert inventory != other
+    assert inventory != inventory.hosts
+
+
+def test_host_list_diff(inventory: HostList) -> None:
+    other = HostList()
+    other.add_host(Host("100", "100.example.com", "192.0.2.1", None, "qemu"))
+    other.add_host(Host("101", "101.example.com", "192.0.2.20", None, "qemu"))
+    other.add_host(Host("103", "103.example.com", None, None, "lxc"))
+
+    added, removed, changed = inventory.diff(other)
+
+    assert [host.vmid for host in added] == ["103"]
+    assert [host.vmid for host in removed] == ["102"]
+    assert [host.vmid for host in changed] == ["101"]
+    assert changed[0].ipv4_address == "192.0.2.20"
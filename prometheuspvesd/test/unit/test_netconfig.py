@@ -0,0 +1,39 @@
+"""Test network config parser."""
+
+import pytest
+
+from prometheuspvesd.netconfig import NetConfig, parse_net_config
+
+
+@pytest.mark.parametrize(
+    "test_input,expected",
+    [
+        (
+            "virtio=D8-85-75-47-2E-8D,bridge=vmbr122,ip=192.0.2.25,ip=2001:db8::666:77:8888",
+            NetConfig("192.0.2.25", None, "2001:db8::666:77:8888", "vmbr122", "D8-85-75-47-2E-8D"),
+        ),
+        (
+            "virtio=BC:24:11:2C:69:EC,bridge=vmbr0,firewall=1",
+            NetConfig(None, None, None, "vmbr0", "BC:24:11:2C:69:EC"),
+        ),
+        (
+            "model=virtio,macaddr=BC:24:11:2C:69:EC,bridge=vmbr0",
+            NetConfig(None, None, None, "vmbr0", "BC:24:11:2C:69:EC"),
+        ),
+        (
+            "name=eth0,bridge=vmbr0,firewall=1,gw=192.0.2.1,hwaddr=BC:24:11:5E:7A:01,"
+            "ip=192.0.2.10/24,ip6=2001:db8::10/64,type=veth",
+            NetConfig("192.0.2.10", "192.0.2.1", "2001:db8::10", "vmbr0", "BC:24:11:5E:7A:01"),
+        ),
+        (
+            "ip=192.0.2.20/24,gw=192.0.2.1,ip6=2001:db8::20/64,gw6=2001:db8::1",
+            NetConfig("192.0.2.20", "192.0.2.1", "2001:db8::20", None, None),
+        ),
+        ("ip=dhcp,ip6=auto", NetConfig()),
+        ("ip=manual,ip6=dhcp", NetConfig()),
+        ("ip=192.0.2,ip6=2001:db8::zz", NetConfig()),
+        ("", NetConfig()),
+    ],
+)
+def test_parse_net_config(test_input: str, expected: NetConfig) -> None:
+    assert parse_net_config(test_input) == expected
@@ -0,0 +1,115 @@
+"""Test output writers."""
+
+import json
+import pathlib
+import tempfile
+
+import pytest
+from prometheus_client import REGISTRY
+from pytest_mock import MockerFixture
+
+from prometheuspvesd.exception import ConfigError
+from prometheuspvesd.model import Host, HostList
+from prometheuspvesd.output import FileWriter, get_path_fields
+
+pytest_plugins = [
+    "prometheuspvesd.test.fixtures.fixtures",
+]
+
+
+def get_host_list() -> HostList:
+    host_list = HostList()
+    host_list.add_host(Host("100", "100.example.com", "192.0.2.1", None, "qemu", "pve1"))
+    host_list.add_host(Host("101", "101.example.com", "192.0.2.2", None, "lxc", "pve1"))
+    host_list.add_host(Host("102", "102.example.com", "192.0.2.3", None, "qemu", "pve2"))
+
+    return host_list
+
+
+def get_targets(path: pathlib.Path) -> list[str]:
+    return [target["targets"][0] for target in json.loads(path.read_text())]
+
+
+def test_file_writer(tmp_path: pathlib.Path, inventory: HostList) -> None:
+    out = tmp_path / "out.json"
+
+    FileWriter(out.as_posix(), "0600", indent=4).write(inventory)
+
+    assert get_targets(out) == ["100.example.com", "101.example.com", "102.example.com"]
+    assert oct(out.stat().st_mode & 0o777) == oct(0o600)
+    assert out.read_text() == json.dumps([host.to_sd_json() for host in inventory], indent=4)
+
+
+def test_file_writer_compact(tmp_path: pathlib.Path, inventory: HostList) -> None:
+    out = tmp_path / "out.json"
+
+    FileWriter(out.as_posix()).write(inventory)
+
+    assert out.read_text() == json.dumps(
+        [host.to_sd_json() for host in inventory], separators=(",", ":")
+    )
+
+
+def test_file_writer_template(tmp_path: pathlib.Path) -> None:
+    writer = FileWriter((tmp_path / "{node}" / "{type}.json").as_posix())
+    host_list = get_host_list()
+
+    writer.write(host_list)
+
+    assert get_targets(tmp_path / "pve1" / "qemu.json") == ["100.example.com"]
+    assert get_targets(tmp_path / "pve1" / "lxc.json") == ["101.example.com"]
+    assert get_targets(tmp_path / "pve2" / "qemu.json") == ["102.example.com"]
+
+    host = host_list.get_host("qemu", "102")
+    assert host is not None
+    host_list.remove_host(host)
+    writer.write(host_list)
+
+    assert (tmp_path / "pve2" / "qemu.json").read_text() == "[]"
+    assert get_targets(tmp_path / "pve1" / "qemu.json") == ["100.example.com"]
+
+
+@pytest.mark.parametrize(
+    "path,expected",
+    [
+        ("/etc/prometheus/pve.json", set()),
+        ("/etc/prometheus/{node}/{type}.json", {"node", "type"}),
+    ],
+)
+def test_get_path_fields(path: str, expected: set[str]) -> None:
+    assert get_path_fields(path) == expected
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["/etc/prometheus/{type}-{env}.json", "/etc/prometheus/{node.name}.json", "/etc/{node.json"],
+)
+def test_get_path_fields_error(path: str) -> None:
+    with pytest.raises(ConfigError, match="Invalid output file path"):
+        get_path_fields(path)
+
+
+def test_file_writer_change_detection(tmp_path: pathlib.Path, mocker: MockerFixture) -> None:
+    writer = FileWriter((tmp_path / "{type}.json").as_posix())
+    host_list = get_host_list()
+    writer.write(host_list)
+    temp_file = mocker.spy(tempfile, "NamedTemporaryFile")
+
+    written = REGISTRY.get_sample_value("pve_sd_output_writes_total", {"result": "written"})
+    skipped = REGISTRY.get_sample_value("pve_sd_output_writes_total", {"result": "skipped"})
+
+    host = host_list.get_host("lxc", "101")
+    assert host is not None
+    host.add_label("status", "stopped")
+    writer.write(host_list)
+
+    assert (
+        REGISTRY.get_sample_value("pve_sd_output_writes_total", {"result": "written"})
+        == (written or 0) + 1
+    )
+    assert (
+        REGISTRY.get_sample_value("pve_sd_output_writes_total", {"result": "skipped"})
+        == (skipped or 0) + 1
+    )
+    # Unchanged targets are only hashed, no temp file is written
+    assert temp_file.call_count == 1
@@ -0,0 +1,60 @@
+"""Test Scheduler class."""
+
+import pytest
+from prometheus_client import REGISTRY
+from pytest_mock import MockerFixture
+
+from prometheuspvesd.scheduler import Scheduler
+
+
+def run(scheduler: Scheduler, mocker: MockerFixture, start: float, end: float) -> float:
+    mocker.patch("prometheuspvesd.scheduler.monotonic", side_effect=[start, end])
+    scheduler.start()
+    return scheduler.finish()
+
+
+def test_scheduler_start_to_start(mocker: MockerFixture) -> None:
+    scheduler = Scheduler(300)
+
+    assert run(scheduler, mocker, 0, 100) == 200
+    assert run(scheduler, mocker, 310, 320) == 290
+    assert REGISTRY.get_sample_value("pve_sd_schedule_lag_seconds") == 10
+
+
+def test_scheduler_jitter(mocker: MockerFixture) -> None:
+    uniform = mocker.patch("random.uniform", return_value=12.5)
+    scheduler = Scheduler(300, jitter=30)
+
+    assert run(scheduler, mocker, 0, 100) == 212.5
+    uniform.assert_called_once_with(0, 30)
+    assert Scheduler(300).get_jitter() == 0
+
+
+def test_scheduler_backoff(mocker: MockerFixture) -> None:
+    missed = REGISTRY.get_sample_value("pve_sd_schedule_missed_total") or 0
+    scheduler = Scheduler(300, max_interval=1000)
+
+    # Loops running longer than the interval double it up to the max interval
+    assert run(scheduler, mocker, 0, 700) == 0
+    assert scheduler.current == 600
+    assert REGISTRY.get_sample_value("pve_sd_schedule_missed_total") == missed + 2
+
+    run(scheduler, mocker, 700, 1400)
+    assert scheduler.current == 1000
+    assert REGISTRY.get_sample_value("pve_sd_schedule_interval_seconds") == 1000
+
+    # Loops within half of the interval decrease it again
+    run(scheduler, mocker, 2000, 2600)
+    assert scheduler.current == 1000
+    run(scheduler, mocker, 3000, 3100)
+    assert scheduler.current == 500
+    run(scheduler, mocker, 3500, 3600)
+    assert scheduler.current == 300
+
+
+@pytest.mark.parametrize("max_interval", [0, 100])
+def test_scheduler_no_backoff(mocker: MockerFixture, max_interval: float) -> None:
+    scheduler = Scheduler(300, max_interval=max_interval)
+
+    assert run(scheduler, mocker, 0, 400) == 0
+    assert scheduler.current == 300
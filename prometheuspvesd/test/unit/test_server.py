@@ -0,0 +1,67 @@
+"""Test HTTPSDServer class."""
+
+import json
+import urllib.error
+import urllib.request
+from collections.abc import Generator
+from typing import Any
+
+import pytest
+
+from prometheuspvesd.model import HostList
+from prometheuspvesd.server import HTTPSDServer
+
+pytest_plugins = [
+    "prometheuspvesd.test.fixtures.fixtures",
+]
+
+
+@pytest.fixture
+def server() -> Generator[HTTPSDServer]:
+    sd_server = HTTPSDServer("127.0.0.1", 0, "/targets")
+    sd_server.start()
+
+    yield sd_server
+
+    sd_server.server.shutdown()
+    sd_server.server.server_close()
+
+
+def get(server: HTTPSDServer, path: str, headers: dict[str, str] | None = None) -> Any:
+    port = server.server.server_address[1]
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", headers=headers or {})
+    try:
+        return urllib.request.urlopen(request, timeout=5)
+    except urllib.error.HTTPError as e:
+        return e
+
+
+def test_http_sd_not_ready(server: HTTPSDServer) -> None:
+    assert get(server, "/targets").status == 503
+
+
+def test_http_sd_not_found(server: HTTPSDServer, inventory: HostList) -> None:
+    server.update(inventory)
+
+    assert get(server, "/dummy").status == 404
+
+
+def test_http_sd_targets(
+    server: HTTPSDServer, inventory: HostList, labels: list[dict[str, Any]]
+) -> None:
+    server.update(inventory)
+
+    response = get(server, "/targets")
+    assert response.status == 200
+    assert response.headers["Content-Type"] == "application/json"
+    assert json.loads(response.read()) == labels
+
+    etag = response.headers["ETag"]
+    assert get(server, "/targets", {"If-None-Match": etag}).status == 304
+
+    inventory.hosts[0].add_label("status", "stopped")
+    server.update(inventory)
+
+    response = get(server, "/targets", {"If-None-Match": etag})
+    assert response.status == 200
+    assert response.headers["ETag"] != etag